@@ -1,20 +1,136 @@
+import inspect
+import itertools
+import os
 import uuid
+from functools import lru_cache
 from typing import Union
 
 from lxml.etree import Element
 from rdflib import Graph, Literal, URIRef, XSD, RDF, RDFS, OWL
-from slugify import slugify
-from acdh_tei_pyutils.utils import make_entity_label
-from acdh_cidoc_pyutils.namespaces import (CIDOC,
-                                           FRBROO,
-                                           NSMAP,
-                                           DATE_ATTRIBUTE_DICT)
+from acdh_cidoc_pyutils.namespaces import (  # noqa: F401
+    CIDOC,
+    FRBROO,
+    NSMAP,
+    DATE_ATTRIBUTE_DICT,
+    GEO_WKT_LITERAL,
+    E5_Event,
+    E33_E41_Linguistic_Appellation,
+    E42_Identifier,
+    E52_Time_Span,
+    E55_Type,
+    E67_Birth,
+    E69_Death,
+    E85_Joining,
+    E86_Leaving,
+    P1_is_identified_by,
+    P2_has_type,
+    P4_has_time_span,
+    P7_took_place_at,
+    P14i_performed,
+    P82a_begin_of_the_begin,
+    P82b_end_of_the_end,
+    P98_brought_into_life,
+    P100_was_death_of,
+    P143_joined,
+    P144_joined_with,
+    P145_separated,
+    P146_separated_from,
+    P168_place_is_defined_by,
+    F51_Pursuit,
+)
+from acdh_cidoc_pyutils import stats, terms
+from acdh_cidoc_pyutils.stats import instrumented
+from acdh_cidoc_pyutils.terms import intern_literal, intern_uri
+from acdh_cidoc_pyutils.xpath import xpath
+
+DATE_LITERAL_CACHE_SIZE = 16384
+APPELLATION_TYPE_CACHE_SIZE = 4096
+
+# elements the make_* functions look up below an entity
+ENTITY_INDEX_TAGS = (
+    "persName",
+    "placeName",
+    "orgName",
+    "idno",
+    "event",
+    "occupation",
+    "affiliation",
+    "birth",
+    "death",
+)
+_ENTITY_INDEX_QNAMES = tuple(f"{{{NSMAP['tei']}}}{x}" for x in ENTITY_INDEX_TAGS)
+
+
+# python-slugify and acdh_tei_pyutils (which pulls in requests & co.) are only
+# imported on first use to keep `import acdh_cidoc_pyutils` cheap
+_slugify = None
+_make_entity_label = None
+
+
+def slugify(text: str, **kwargs) -> str:
+    global _slugify
+    if _slugify is None:
+        from slugify import slugify as _slugify
+    return _slugify(text, **kwargs)
+
+
+def make_entity_label(*args, **kwargs):
+    global _make_entity_label
+    if _make_entity_label is None:
+        from acdh_tei_pyutils.utils import make_entity_label as _make_entity_label
+    return _make_entity_label(*args, **kwargs)
 
 
 def normalize_string(string: str) -> str:
     return " ".join(" ".join(string.split()).split())
 
 
+def index_entity(node: Element) -> dict:
+    """collects the ENTITY_INDEX_TAGS descendants of `node` (by local name, in
+    document order) in a single walk over the subtree"""
+    index = {x: [] for x in ENTITY_INDEX_TAGS}
+    for x in node.iterdescendants(*_ENTITY_INDEX_QNAMES):
+        index[x.tag.split("}")[-1]].append(x)
+    return index
+
+
+@lru_cache(maxsize=1024)
+def _accepts_entity_index(builder) -> bool:
+    try:
+        parameters = inspect.signature(builder).parameters.values()
+    except (TypeError, ValueError):
+        return False
+    return any(
+        x.name == "entity_index" or x.kind is inspect.Parameter.VAR_KEYWORD
+        for x in parameters
+    )
+
+
+def make_entity(subj: URIRef, node: Element, builders, sink=None, entity_index=None):
+    """runs `builders` on `node`, those accepting an `entity_index` keyword
+    share a single `index_entity` walk over the entity"""
+    g = Graph() if sink is None else sink
+    builders = [(x, _accepts_entity_index(x)) for x in builders]
+    if entity_index is None and any(x[1] for x in builders):
+        entity_index = index_entity(node)
+    for builder, accepts_index in builders:
+        if accepts_index:
+            builder(subj, node, sink=g, entity_index=entity_index)
+        else:
+            builder(subj, node, sink=g)
+    return g
+
+
+def _add_type(g, type_uri: URIRef, label: Literal = None, type_registry=None):
+    if type_registry is not None:
+        type_registry.add(g, type_uri, label)
+        return
+    g.add((type_uri, RDF.type, E55_Type))
+    if label is not None:
+        g.add((type_uri, RDFS.label, label))
+
+
+@instrumented
 def coordinates_to_p168(
     subj: URIRef,
     node: Element,
@@ -22,10 +138,11 @@ def coordinates_to_p168(
     separator=" ",
     inverse=False,
     verbose=False,
+    sink=None,
 ) -> Graph:
-    g = Graph()
+    g = Graph() if sink is None else sink
     try:
-        coords = node.xpath(coords_xpath, namespaces=NSMAP)[0]
+        coords = xpath(node, coords_xpath)[0]
     except IndexError as e:
         if verbose:
             print(e, subj)
@@ -38,31 +155,45 @@ def coordinates_to_p168(
         return g
     if inverse:
         lat, lng = lng, lat
-    g.set(
+    g.add(
         (
             subj,
-            CIDOC["P168_place_is_defined_by"],
-            Literal(f"Point({lng} {lat})", datatype="geo:wktLiteral"),
+            P168_place_is_defined_by,
+            Literal(f"Point({lng} {lat})", datatype=GEO_WKT_LITERAL),
         )
     )
     return g
 
 
+def _attribute_ranks(attribute_map: dict) -> dict:
+    return {key: (i, value) for i, (key, value) in enumerate(attribute_map.items())}
+
+
+_DATE_ATTRIBUTE_RANKS = _attribute_ranks(DATE_ATTRIBUTE_DICT)
+
+
 def extract_begin_end(
     date_object: Union[Element, dict],
     fill_missing=True,
     attribute_map=DATE_ATTRIBUTE_DICT,
 ) -> tuple[Union[str, bool], Union[str, bool]]:
     final_start, final_end = None, None
-    start, end, when = None, None, None
-    for key, value in attribute_map.items():
-        date_value = date_object.get(key)
-        if date_value and value == "start":
-            start = date_value
-        if date_value and value == "end":
-            end = date_value
-        if date_value and value == "when":
-            when = date_value
+    if attribute_map is DATE_ATTRIBUTE_DICT:
+        ranks = _DATE_ATTRIBUTE_RANKS
+    else:
+        ranks = _attribute_ranks(attribute_map)
+    # only look at the attributes present; later keys of attribute_map win
+    found = {}
+    for key, date_value in date_object.items():
+        ranked = ranks.get(key)
+        if ranked is None or not date_value:
+            continue
+        rank, value = ranked
+        if value not in found or found[value][0] < rank:
+            found[value] = (rank, date_value)
+    start = found["start"][1] if "start" in found else None
+    end = found["end"][1] if "end" in found else None
+    when = found["when"][1] if "when" in found else None
     if fill_missing:
         if start or end or when:
             if start and end:
@@ -85,8 +216,9 @@ def extract_begin_end(
     return final_start, final_end
 
 
-def date_to_literal(
-    date_str: Union[str, bool], not_known_value="undefined", default_lang="en"
+@lru_cache(maxsize=DATE_LITERAL_CACHE_SIZE)
+def _date_to_literal(
+    date_str: Union[str, bool], not_known_value: str, default_lang: str
 ) -> Literal:
     if date_str is None:
         return_value = Literal(not_known_value, lang=default_lang)
@@ -106,17 +238,115 @@ def date_to_literal(
     return return_value
 
 
-def make_uri(domain="https://foo.bar/whatever",
-             version="",
-             prefix="") -> URIRef:
+def date_to_literal(
+    date_str: Union[str, bool], not_known_value="undefined", default_lang="en"
+) -> Literal:
+    if isinstance(date_str, str):
+        # str() drops lxml smart string references to their parent element
+        date_str = str(date_str)
+    if stats._active is None:
+        return _date_to_literal(date_str, not_known_value, default_lang)
+    hits = _date_to_literal.cache_info().hits
+    result = _date_to_literal(date_str, not_known_value, default_lang)
+    stats.record_cache(_date_to_literal.cache_info().hits != hits)
+    return result
+
+
+def date_literal_cache_info():
+    return _date_to_literal.cache_info()
+
+
+def date_literal_cache_clear():
+    _date_to_literal.cache_clear()
+
+
+def _uri_base(domain: str, version: str, prefix: str) -> str:
     if domain.endswith("/"):
         domain = domain[:-1]
-    some_id = f"{uuid.uuid1()}"
-    uri_parts = [domain, version, prefix, some_id]
-    uri = "/".join([x for x in uri_parts if x != ""])
-    return URIRef(uri)
+    return "/".join([x for x in [domain, version, prefix] if x != ""])
+
+
+def _key_to_uuid(base: str, key) -> uuid.UUID:
+    if isinstance(key, (list, tuple)):
+        key = "\x1f".join(f"{x}" for x in key)
+    return uuid.uuid5(uuid.NAMESPACE_URL, f"{base}#{key}")
+
+
+def make_uri(domain="https://foo.bar/whatever",
+             version="",
+             prefix="",
+             key=None) -> URIRef:
+    base = _uri_base(domain, version, prefix)
+    if key is None:
+        some_id = f"{uuid.uuid1()}"
+    else:
+        some_id = f"{_key_to_uuid(base, key)}"
+    return URIRef("/".join([x for x in [base, some_id] if x != ""]))
+
 
+def make_uris(n: int,
+              domain="https://foo.bar/whatever",
+              version="",
+              prefix="") -> list:
+    base = _uri_base(domain, version, prefix)
+    random_bytes = os.urandom(16 * n)
+    return [
+        URIRef(f"{base}/{uuid.UUID(bytes=random_bytes[i:i + 16], version=4)}")
+        for i in range(0, 16 * n, 16)
+    ]
 
+
+class UriMinter:
+    """mints URIs below `domain/version/prefix`
+
+    strategies: `uuid1` (random, like make_uri), `uuid5` (derived from a key passed
+    to `mint`, stable between runs) and `counter` (`{run_prefix}{n}`, stable between
+    runs as long as the minting order doesn't change)
+    """
+
+    STRATEGIES = ("uuid1", "uuid5", "counter")
+
+    def __init__(self,
+                 domain="https://foo.bar/whatever",
+                 version="",
+                 prefix="",
+                 strategy="uuid5",
+                 run_prefix="",
+                 start=0):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"unknown minting strategy: {strategy}")
+        self.base = _uri_base(domain, version, prefix)
+        self.strategy = strategy
+        self.run_prefix = run_prefix
+        self._counter = itertools.count(start)
+
+    def mint(self, key=None) -> URIRef:
+        if self.strategy == "counter":
+            some_id = f"{self.run_prefix}{next(self._counter)}"
+        elif self.strategy == "uuid5":
+            if key is None:
+                raise ValueError("the uuid5 strategy needs a key")
+            some_id = f"{_key_to_uuid(self.base, key)}"
+        else:
+            some_id = f"{uuid.uuid1()}"
+        return URIRef(f"{self.base}/{some_id}")
+
+    def mint_many(self, n: int = None, keys=None) -> list:
+        if keys is not None:
+            return [self.mint(key) for key in keys]
+        if self.strategy == "counter":
+            start = next(self._counter)
+            self._counter = itertools.count(start + n)
+            return [
+                URIRef(f"{self.base}/{self.run_prefix}{i}")
+                for i in range(start, start + n)
+            ]
+        if self.strategy == "uuid5":
+            raise ValueError("the uuid5 strategy needs keys")
+        return [URIRef(f"{self.base}/{uuid.uuid1()}") for _ in range(n)]
+
+
+@instrumented
 def create_e52(
     uri: URIRef,
     type_uri: URIRef = None,
@@ -125,86 +355,61 @@ def create_e52(
     label=True,
     not_known_value="undefined",
     default_lang="en",
+    sink=None,
 ) -> Graph:
-    g = Graph()
-    g.add((uri, RDF.type, CIDOC["E52_Time-Span"]))
+    g = Graph() if sink is None else sink
+    g.add((uri, RDF.type, E52_Time_Span))
+    begin_literal = date_to_literal(
+        begin_of_begin, not_known_value=not_known_value, default_lang=default_lang
+    )
+    end_literal = date_to_literal(
+        end_of_end, not_known_value=not_known_value, default_lang=default_lang
+    )
     if begin_of_begin != "":
-        g.add(
-            (
-                uri,
-                CIDOC["P82a_begin_of_the_begin"],
-                date_to_literal(
-                    begin_of_begin,
-                    not_known_value=not_known_value,
-                    default_lang=default_lang,
-                ),
-            )
-        )
+        g.add((uri, P82a_begin_of_the_begin, begin_literal))
     if end_of_end != "":
-        g.add(
-            (
-                uri,
-                CIDOC["P82b_end_of_the_end"],
-                date_to_literal(
-                    end_of_end,
-                    not_known_value=not_known_value,
-                    default_lang=default_lang
-                ),
-            )
-        )
+        g.add((uri, P82b_end_of_the_end, end_literal))
     if end_of_end == "" and begin_of_begin != "":
-        g.add(
-            (
-                uri,
-                CIDOC["P82b_end_of_the_end"],
-                date_to_literal(
-                    begin_of_begin,
-                    not_known_value=not_known_value,
-                    default_lang=default_lang,
-                ),
-            )
-        )
+        g.add((uri, P82b_end_of_the_end, begin_literal))
     if begin_of_begin == "" and end_of_end != "":
-        g.add(
-            (
-                uri,
-                CIDOC["P82a_begin_of_the_begin"],
-                date_to_literal(
-                    end_of_end,
-                    not_known_value=not_known_value,
-                    default_lang=default_lang
-                ),
-            )
-        )
-    else:
-        pass
+        g.add((uri, P82a_begin_of_the_begin, end_literal))
     if label:
-        label_str = " - ".join(
-            [
-                date_to_literal(
-                    begin_of_begin,
-                    not_known_value=not_known_value,
-                    default_lang=default_lang
-                ),
-                date_to_literal(
-                    end_of_end,
-                    not_known_value=not_known_value,
-                    default_lang=default_lang
-                ),
-            ]
-        ).strip()
-        if label_str != "":
-            start, end = label_str.split(" - ")
-            if start == end:
-                g.add((uri, RDFS.label, Literal(start, datatype=XSD.string)))
-            else:
-                g.add((uri, RDFS.label, Literal(label_str,
-                                                datatype=XSD.string)))
+        start, end = str(begin_literal), str(end_literal)
+        label_str = start if start == end else f"{start} - {end}"
+        g.add((uri, RDFS.label, Literal(label_str.strip(), datatype=XSD.string)))
     if type_uri:
-        g.add((uri, CIDOC["P2_has_type"], type_uri))
+        g.add((uri, P2_has_type, type_uri))
     return g
 
 
+@lru_cache(maxsize=APPELLATION_TYPE_CACHE_SIZE)
+def _appellation_type(type_uri: str, type_label: str, pool_generation: int) -> tuple:
+    if type_label:
+        return (
+            intern_uri(f"{type_uri}/{slugify(type_label)}".lower()),
+            intern_literal(type_label),
+        )
+    return intern_uri(type_uri.lower()), None
+
+
+def appellation_type(type_uri: str, type_label: str = None) -> tuple:
+    if stats._active is None:
+        return _appellation_type(type_uri, type_label, terms._generation)
+    hits = _appellation_type.cache_info().hits
+    result = _appellation_type(type_uri, type_label, terms._generation)
+    stats.record_cache(_appellation_type.cache_info().hits != hits)
+    return result
+
+
+def appellation_type_cache_info():
+    return _appellation_type.cache_info()
+
+
+def appellation_type_cache_clear():
+    _appellation_type.cache_clear()
+
+
+@instrumented
 def make_appellations(
     subj: URIRef,
     node: Element,
@@ -212,32 +417,40 @@ def make_appellations(
     type_attribute="type",
     default_lang="de",
     special_regex=None,
+    sink=None,
+    type_registry=None,
+    entity_index=None,
 ) -> Graph:
     if not type_domain.endswith("/"):
         type_domain = f"{type_domain}/"
-    g = Graph()
+    g = Graph() if sink is None else sink
     tag_name = node.tag.split("}")[-1]
     base_type_uri = f"{type_domain}{tag_name}"
     if tag_name.endswith("place"):
-        xpath_expression = ".//tei:placeName"
+        name_tag = "placeName"
     elif tag_name.endswith("person"):
-        xpath_expression = ".//tei:persName"
+        name_tag = "persName"
     elif tag_name.endswith("org"):
-        xpath_expression = ".//tei:orgName"
+        name_tag = "orgName"
     else:
         return g
     if special_regex:
-        xpath_expression = f"{xpath_expression}{special_regex}"
-    for i, y in enumerate(node.xpath(xpath_expression, namespaces=NSMAP)):
+        name_nodes = xpath(node, f".//tei:{name_tag}{special_regex}")
+    elif entity_index is not None:
+        name_nodes = entity_index[name_tag]
+    else:
+        name_nodes = xpath(node, f".//tei:{name_tag}")
+    for i, y in enumerate(name_nodes):
         try:
             lang_tag = y.attrib["{http://www.w3.org/XML/1998/namespace}lang"]
         except KeyError:
             lang_tag = default_lang
         type_uri = f"{base_type_uri}/{y.tag.split('}')[-1]}"
-        if len(y.xpath("./*")) < 1 and y.text:
+        child_count = len(xpath(y, "./*"))
+        if child_count < 1 and y.text:
             app_uri = URIRef(f"{subj}/appellation/{i}")
-            g.add((subj, CIDOC["P1_is_identified_by"], app_uri))
-            g.add((app_uri, RDF.type, CIDOC["E33_E41_Linguistic_Appellation"]))
+            g.add((subj, P1_is_identified_by, app_uri))
+            g.add((app_uri, RDF.type, E33_E41_Linguistic_Appellation))
             g.add(
                 (app_uri, RDFS.label, Literal(normalize_string(y.text),
                                               lang=lang_tag))
@@ -245,26 +458,20 @@ def make_appellations(
             g.add(
                 (app_uri, RDF.value, Literal(normalize_string(y.text)))
             )
-            type_label = y.get(type_attribute)
-            if type_label:
-                cur_type_uri = URIRef(f"{type_uri}/{slugify(type_label)}".lower())
-            else:
-                cur_type_uri = URIRef(type_uri.lower())
-            g.add((cur_type_uri, RDF.type, CIDOC["E55_Type"]))
-            if type_label:
-                g.add((cur_type_uri, RDFS.label, Literal(type_label)))
-            g.add((app_uri, CIDOC["P2_has_type"], cur_type_uri))
-        elif len(y.xpath("./*")) > 1:
+            cur_type_uri, type_label = appellation_type(type_uri, y.get(type_attribute))
+            _add_type(g, cur_type_uri, type_label, type_registry)
+            g.add((app_uri, P2_has_type, cur_type_uri))
+        elif child_count > 1:
             app_uri = URIRef(f"{subj}/appellation/{i}")
-            g.add((subj, CIDOC["P1_is_identified_by"], app_uri))
-            g.add((app_uri, RDF.type, CIDOC["E33_E41_Linguistic_Appellation"]))
+            g.add((subj, P1_is_identified_by, app_uri))
+            g.add((app_uri, RDF.type, E33_E41_Linguistic_Appellation))
             entity_label_str, cur_lang = make_entity_label(y, default_lang=default_lang)
             g.add((app_uri,
                    RDFS.label,
                    Literal(normalize_string(entity_label_str), lang=cur_lang)))
-            cur_type_uri = URIRef(f"{type_uri.lower()}")
-            g.add((cur_type_uri, RDF.type, CIDOC["E55_Type"]))
-            g.add((app_uri, CIDOC["P2_has_type"], cur_type_uri))
+            cur_type_uri, _ = appellation_type(type_uri)
+            _add_type(g, cur_type_uri, type_registry=type_registry)
+            g.add((app_uri, P2_has_type, cur_type_uri))
         # see https://github.com/acdh-oeaw/acdh-cidoc-pyutils/issues/36
         # for c, child in enumerate(y.xpath("./*")):
         #     cur_type_uri = f"{type_uri}/{child.tag.split('}')[-1]}".lower()
@@ -280,10 +487,10 @@ def make_appellations(
         #     except KeyError:
         #         child_lang_tag = lang_tag
         #     app_uri = URIRef(f"{subj}/appellation/{i}/{c}")
-        #     g.add((subj, CIDOC["P1_is_identified_by"], app_uri))
+        #     g.add((subj, P1_is_identified_by, app_uri))
         #     g.add((app_uri,
         #           RDF.type,
-        #           CIDOC["E33_E41_Linguistic_Appellation"]))
+        #           E33_E41_Linguistic_Appellation))
         #     g.add(
         #         (
         #             app_uri,
@@ -299,12 +506,12 @@ def make_appellations(
         #             Literal(normalize_string(child.text)),
         #         )
         #     )
-        #     g.add((cur_type_uri, RDF.type, CIDOC["E55_Type"]))
+        #     g.add((cur_type_uri, RDF.type, E55_Type))
         #     if type_label:
         #         g.add((cur_type_uri, RDFS.label, Literal(type_label)))
-        #     g.add((app_uri, CIDOC["P2_has_type"], cur_type_uri))
+        #     g.add((app_uri, P2_has_type, cur_type_uri))
     try:
-        first_name_el = node.xpath(xpath_expression, namespaces=NSMAP)[0]
+        first_name_el = name_nodes[0]
     except IndexError:
         return g
     entity_label_str, cur_lang = make_entity_label(first_name_el, default_lang=default_lang)
@@ -312,6 +519,7 @@ def make_appellations(
     return g
 
 
+@instrumented
 def make_e42_identifiers(
     subj: URIRef,
     node: Element,
@@ -319,9 +527,12 @@ def make_e42_identifiers(
     default_lang="de",
     set_lang=False,
     same_as=True,
-    default_prefix="Identifier: "
+    default_prefix="Identifier: ",
+    sink=None,
+    type_registry=None,
+    entity_index=None,
 ) -> Graph:
-    g = Graph()
+    g = Graph() if sink is None else sink
     try:
         lang = node.attrib["{http://www.w3.org/XML/1998/namespace}lang"]
     except KeyError:
@@ -335,38 +546,48 @@ def make_e42_identifiers(
     if not type_domain.endswith("/"):
         type_domain = f"{type_domain}/"
     app_uri = URIRef(f"{subj}/identifier/{xml_id}")
-    type_uri = URIRef(f"{type_domain}idno/xml-id")
-    approx_uri = URIRef(f"{type_domain}date/approx")
-    g.add((approx_uri, RDF.type, CIDOC["E55_Type"]))
-    g.add((approx_uri, RDFS.label, Literal("approx")))
-    g.add((type_uri, RDF.type, CIDOC["E55_Type"]))
-    g.add((subj, CIDOC["P1_is_identified_by"], app_uri))
-    g.add((app_uri, RDF.type, CIDOC["E42_Identifier"]))
+    type_uri = intern_uri(f"{type_domain}idno/xml-id")
+    approx_uri = intern_uri(f"{type_domain}date/approx")
+    _add_type(g, approx_uri, intern_literal("approx"), type_registry)
+    _add_type(g, type_uri, type_registry=type_registry)
+    g.add((subj, P1_is_identified_by, app_uri))
+    g.add((app_uri, RDF.type, E42_Identifier))
     g.add((app_uri, RDFS.label, Literal(label_value, lang=lang)))
     g.add((app_uri, RDF.value, Literal(normalize_string(xml_id))))
-    g.add((app_uri, CIDOC["P2_has_type"], type_uri))
+    g.add((app_uri, P2_has_type, type_uri))
     events_types = {}
-    for i, x in enumerate(node.xpath(".//tei:event[@type]", namespaces=NSMAP)):
+    if entity_index is None:
+        typed_events = xpath(node, ".//tei:event[@type]")
+    else:
+        typed_events = [x for x in entity_index["event"] if "type" in x.attrib]
+    for i, x in enumerate(typed_events):
         events_types[x.attrib["type"]] = x.attrib["type"]
     if events_types:
         for i, x in enumerate(events_types.keys()):
-            event_type_uri = URIRef(f"{type_domain}event/{x}")
-            g.add((event_type_uri, RDF.type, CIDOC["E55_Type"]))
-            g.add((event_type_uri, RDFS.label, Literal(x, lang=default_lang)))
-    for i, x in enumerate(node.xpath(".//tei:idno", namespaces=NSMAP)):
+            event_type_uri = intern_uri(f"{type_domain}event/{x}")
+            _add_type(g,
+                      event_type_uri,
+                      intern_literal(x, lang=default_lang),
+                      type_registry)
+    if entity_index is None:
+        idnos = xpath(node, ".//tei:idno")
+    else:
+        idnos = entity_index["idno"]
+    for i, x in enumerate(idnos):
         idno_type_base_uri = f"{type_domain}idno"
         if x.text:
             idno_uri = URIRef(f"{subj}/identifier/idno/{i}")
-            g.add((subj, CIDOC["P1_is_identified_by"], idno_uri))
+            g.add((subj, P1_is_identified_by, idno_uri))
             idno_type = x.get("type")
             if idno_type:
                 idno_type_base_uri = f"{idno_type_base_uri}/{idno_type}"
             idno_type = x.get("subtype")
             if idno_type:
                 idno_type_base_uri = f"{idno_type_base_uri}/{idno_type}"
-            g.add((idno_uri, RDF.type, CIDOC["E42_Identifier"]))
-            g.add((idno_uri, CIDOC["P2_has_type"], URIRef(idno_type_base_uri)))
-            g.add((URIRef(idno_type_base_uri), RDF.type, CIDOC["E55_Type"]))
+            g.add((idno_uri, RDF.type, E42_Identifier))
+            idno_type_uri = intern_uri(idno_type_base_uri)
+            g.add((idno_uri, P2_has_type, idno_type_uri))
+            _add_type(g, idno_type_uri, type_registry=type_registry)
             label_value = normalize_string(f"{default_prefix}{x.text}")
             g.add((idno_uri, RDFS.label, Literal(label_value, lang=lang)))
             g.add((idno_uri, RDF.value, Literal(normalize_string(x.text))))
@@ -378,27 +599,34 @@ def make_e42_identifiers(
     return g
 
 
+@instrumented
 def make_occupations(
     subj: URIRef,
     node: Element,
     prefix="occupation",
     id_xpath=False,
     default_lang="de",
-    not_known_value="undefined"
+    not_known_value="undefined",
+    sink=None,
+    entity_index=None,
 ):
-    g = Graph()
+    g = Graph() if sink is None else sink
     occ_uris = []
     base_uri = f"{subj}/{prefix}"
-    for i, x in enumerate(node.xpath(".//tei:occupation", namespaces=NSMAP)):
+    if entity_index is None:
+        occupations = xpath(node, ".//tei:occupation")
+    else:
+        occupations = entity_index["occupation"]
+    for i, x in enumerate(occupations):
         try:
             lang = x.attrib["{http://www.w3.org/XML/1998/namespace}lang"]
         except KeyError:
             lang = default_lang
-        occ_text = normalize_string(" ".join(x.xpath(".//text()")))
+        occ_text = normalize_string(" ".join(xpath(x, ".//text()")))
 
         if id_xpath:
             try:
-                occ_id = x.xpath(id_xpath, namespaces=NSMAP)[0]
+                occ_id = xpath(x, id_xpath)[0]
             except IndexError:
                 pass
         else:
@@ -407,20 +635,22 @@ def make_occupations(
             occ_id = occ_id[1:]
         occ_uri = URIRef(f"{base_uri}/{occ_id}")
         occ_uris.append(occ_uri)
-        g.add((occ_uri, RDF.type, FRBROO["F51_Pursuit"]))
+        g.add((occ_uri, RDF.type, F51_Pursuit))
         g.add((occ_uri, RDFS.label, Literal(occ_text, lang=lang)))
-        g.add((subj, CIDOC["P14i_performed"], occ_uri))
+        g.add((subj, P14i_performed, occ_uri))
         begin, end = extract_begin_end(x, fill_missing=False)
         if begin or end:
             ts_uri = URIRef(f"{occ_uri}/time-span")
-            g.add((occ_uri, CIDOC["P4_has_time-span"], ts_uri))
-            g += create_e52(ts_uri,
-                            begin_of_begin=begin,
-                            end_of_end=end,
-                            not_known_value=not_known_value)
+            g.add((occ_uri, P4_has_time_span, ts_uri))
+            create_e52(ts_uri,
+                       begin_of_begin=begin,
+                       end_of_end=end,
+                       not_known_value=not_known_value,
+                       sink=g)
     return (g, occ_uris)
 
 
+@instrumented
 def make_affiliations(
     subj: URIRef,
     node: Element,
@@ -429,53 +659,67 @@ def make_affiliations(
     org_id_xpath="./@ref",
     org_label_xpath="",
     lang="en",
+    sink=None,
+    entity_index=None,
+    org_index=None,
+    ref_index=None,
 ):
-    g = Graph()
+    g = Graph() if sink is None else sink
     xml_id = node.attrib["{http://www.w3.org/XML/1998/namespace}id"]
     item_id = f"{domain}{xml_id}"
     subj = URIRef(item_id)
-    for i, x in enumerate(node.xpath(".//tei:affiliation", namespaces=NSMAP)):
+    if entity_index is None:
+        affiliations = xpath(node, ".//tei:affiliation")
+    else:
+        affiliations = entity_index["affiliation"]
+    for i, x in enumerate(affiliations):
         try:
-            affiliation_id = x.xpath(org_id_xpath, namespaces=NSMAP)[0]
+            affiliation_id = xpath(x, org_id_xpath)[0]
         except IndexError:
             continue
-        if org_label_xpath == "":
-            org_label = normalize_string(" ".join(x.xpath(".//text()")))
+        if affiliation_id.startswith("#"):
+            affiliation_id = affiliation_id[1:]
+        if ref_index is not None:
+            ref_index.check(affiliation_id, subj)
+        org_label = None if org_index is None else org_index.get(affiliation_id)
+        if org_label is not None:
+            org_label = normalize_string(org_label)
+        elif org_label_xpath == "":
+            org_label = normalize_string(" ".join(xpath(x, ".//text()")))
         else:
             org_label = normalize_string(
-                " ".join(x.xpath(org_label_xpath, namespaces=NSMAP))
+                " ".join(xpath(x, org_label_xpath))
             )
-        if affiliation_id.startswith("#"):
-            affiliation_id = affiliation_id[1:]
         org_affiliation_uri = URIRef(f"{domain}{affiliation_id}")
         join_uri = URIRef(f"{subj}/joining/{affiliation_id}/{i}")
         join_label = normalize_string(f"{person_label} joins {org_label}")
-        g.add((join_uri, RDF.type, CIDOC["E85_Joining"]))
-        g.add((join_uri, CIDOC["P143_joined"], subj))
-        g.add((join_uri, CIDOC["P144_joined_with"], org_affiliation_uri))
+        g.add((join_uri, RDF.type, E85_Joining))
+        g.add((join_uri, P143_joined, subj))
+        g.add((join_uri, P144_joined_with, org_affiliation_uri))
         g.add((join_uri, RDFS.label, Literal(join_label, lang=lang)))
 
         begin, end = extract_begin_end(x, fill_missing=False)
         if begin:
             ts_uri = URIRef(f"{join_uri}/time-span/{begin}")
-            g.add((join_uri, CIDOC["P4_has_time-span"], ts_uri))
-            g += create_e52(ts_uri, begin_of_begin=begin, end_of_end=begin)
+            g.add((join_uri, P4_has_time_span, ts_uri))
+            create_e52(ts_uri, begin_of_begin=begin, end_of_end=begin, sink=g)
         if end:
             leave_uri = URIRef(f"{subj}/leaving/{affiliation_id}/{i}")
             leave_label = normalize_string(
                 f"{person_label} leaves {org_label}")
-            g.add((leave_uri, RDF.type, CIDOC["E86_Leaving"]))
-            g.add((leave_uri, CIDOC["P145_separated"], subj))
+            g.add((leave_uri, RDF.type, E86_Leaving))
+            g.add((leave_uri, P145_separated, subj))
             g.add((leave_uri,
-                   CIDOC["P146_separated_from"],
+                   P146_separated_from,
                    org_affiliation_uri))
             g.add((leave_uri, RDFS.label, Literal(leave_label, lang=lang)))
             ts_uri = URIRef(f"{leave_uri}/time-span/{end}")
-            g.add((leave_uri, CIDOC["P4_has_time-span"], ts_uri))
-            g += create_e52(ts_uri, begin_of_begin=end, end_of_end=end)
+            g.add((leave_uri, P4_has_time_span, ts_uri))
+            create_e52(ts_uri, begin_of_begin=end, end_of_end=end, sink=g)
     return g
 
 
+@instrumented
 def make_birth_death_entities(
     subj: URIRef,
     node: Element,
@@ -486,123 +730,149 @@ def make_birth_death_entities(
     default_prefix="Geburt von",
     default_lang="de",
     date_node_xpath="",
-    place_id_xpath="//tei:placeName/@key"
+    place_id_xpath="//tei:placeName/@key",
+    sink=None,
+    entity_index=None,
+    ref_index=None,
 ):
-    g = Graph()
-    name_node = node.xpath(".//tei:persName[1]", namespaces=NSMAP)[0]
+    g = Graph() if sink is None else sink
+    if entity_index is None:
+        name_node = xpath(node, ".//tei:persName[1]")[0]
+    else:
+        name_node = entity_index["persName"][0]
     label, label_lang = make_entity_label(name_node, default_lang=default_lang)
     if event_type not in ["birth", "death"]:
         return (g, None, None)
     if event_type == "birth":
-        cidoc_property = CIDOC["P98_brought_into_life"]
-        cidoc_class = CIDOC["E67_Birth"]
+        cidoc_property = P98_brought_into_life
+        cidoc_class = E67_Birth
     else:
-        cidoc_property = CIDOC["P100_was_death_of"]
-        cidoc_class = CIDOC["E69_Death"]
+        cidoc_property = P100_was_death_of
+        cidoc_class = E69_Death
     xpath_expr = f".//tei:{event_type}[1]"
     place_xpath = f"{xpath_expr}{place_id_xpath}"
     if date_node_xpath != "":
         date_xpath = f"{xpath_expr}/{date_node_xpath}"
     else:
         date_xpath = xpath_expr
+    if entity_index is None:
+        event_nodes = xpath(node, xpath_expr)
+    else:
+        event_nodes = entity_index[event_type]
     try:
-        node.xpath(xpath_expr, namespaces=NSMAP)[0]
+        event_nodes[0]
     except IndexError as e:
         if verbose:
             print(subj, e)
             return (g, None, None)
     event_uri = URIRef(f"{subj}/{event_type}")
     time_stamp_uri = URIRef(f"{event_uri}/time-span")
-    g.set((event_uri, cidoc_property, subj))
-    g.set((event_uri, RDF.type, cidoc_class))
+    g.add((event_uri, cidoc_property, subj))
+    g.add((event_uri, RDF.type, cidoc_class))
     g.add(
         (event_uri,
          RDFS.label,
          Literal(f"{default_prefix} {label}", lang=label_lang))
     )
-    g.set((event_uri, CIDOC["P4_has_time-span"], time_stamp_uri))
+    g.add((event_uri, P4_has_time_span, time_stamp_uri))
     try:
-        date_node = node.xpath(date_xpath, namespaces=NSMAP)[0]
+        if date_node_xpath == "":
+            date_node = event_nodes[0]
+        else:
+            date_node = xpath(node, date_xpath)[0]
         process_date = True
     except IndexError:
         process_date = False
     if process_date:
         start, end = extract_begin_end(date_node)
-        g += create_e52(time_stamp_uri,
-                        type_uri,
-                        begin_of_begin=start,
-                        end_of_end=end)
+        create_e52(time_stamp_uri,
+                   type_uri,
+                   begin_of_begin=start,
+                   end_of_end=end,
+                   sink=g)
     try:
-        place_node = node.xpath(place_xpath, namespaces=NSMAP)[0]
+        place_node = xpath(node, place_xpath)[0]
         process_place = True
     except IndexError:
         process_place = False
     if process_place:
         if place_node.startswith("#"):
             place_node = place_node[1:]
+        if ref_index is not None:
+            ref_index.check(place_node, event_uri)
         place_uri = URIRef(f"{domain}{place_node}")
-        g.add((event_uri, CIDOC["P7_took_place_at"], place_uri))
+        g.add((event_uri, P7_took_place_at, place_uri))
     return (g, event_uri, time_stamp_uri)
 
 
+@instrumented
 def make_events(
     subj: URIRef,
     node: Element,
     type_domain: str,
     default_prefix="Event:",
     default_lang="de",
-    domain="https://sk.acdh.oeaw.ac.at/"
+    domain="https://sk.acdh.oeaw.ac.at/",
+    sink=None,
+    entity_index=None,
+    ref_index=None,
 ):
-    g = Graph()
+    g = Graph() if sink is None else sink
     date_node_xpath = "./tei:desc/tei:date[@when]"
     place_id_xpath = "./tei:desc/tei:placeName[@key]/@key"
     note_literal_xpath = "./tei:note/text()"
     event_type_xpath = "@type"
-    for i, x in enumerate(node.xpath(".//tei:event", namespaces=NSMAP)):
+    if entity_index is None:
+        events = xpath(node, ".//tei:event")
+    else:
+        events = entity_index["event"]
+    for i, x in enumerate(events):
         # create event as E5_type
         event_uri = URIRef(f"{subj}/event/{i}")
-        g.add((event_uri, RDF.type, CIDOC["E5_Event"]))
+        g.add((event_uri, RDF.type, E5_Event))
         # create note label
         if note_literal_xpath == "":
-            note_label = normalize_string(" ".join(x.xpath(".//text()")))
+            note_label = normalize_string(" ".join(xpath(x, ".//text()")))
         else:
-            note_label = normalize_string(" ".join(x.xpath(note_literal_xpath, namespaces=NSMAP)))
+            note_label = normalize_string(" ".join(xpath(x, note_literal_xpath)))
         event_label = normalize_string(f"{default_prefix} {note_label}")
         g.add((event_uri, RDFS.label, Literal(event_label, lang=default_lang)))
         # create event time-span
         g.add((event_uri,
-               CIDOC["P4_has_time-span"],
+               P4_has_time_span,
                URIRef(f"{event_uri}/time-span")))
         # create event placeName
         if place_id_xpath == "":
-            place_id = x.xpath(".//tei:placeName[@key]/@key", namespaces=NSMAP)
+            place_id = xpath(x, ".//tei:placeName[@key]/@key")
         else:
-            place_id = x.xpath(place_id_xpath, namespaces=NSMAP)
+            place_id = xpath(x, place_id_xpath)
         if place_id:
+            place_id = place_id[0].split("#")[-1]
+            if ref_index is not None:
+                ref_index.check(place_id, event_uri)
             g.add((event_uri,
-                   CIDOC["P7_took_place_at"],
-                   URIRef(f"{domain}{place_id[0].split('#')[-1]}")))
+                   P7_took_place_at,
+                   URIRef(f"{domain}{place_id}")))
         # create event type
         if event_type_xpath == "":
             event_type = normalize_string(
-                x.xpath(".//tei:event[@type]/@type")[0])
+                xpath(x, ".//tei:event[@type]/@type")[0])
         else:
-            event_type = normalize_string(x.xpath(event_type_xpath, namespaces=NSMAP)[0])
+            event_type = normalize_string(xpath(x, event_type_xpath)[0])
         g.add((event_uri,
-               CIDOC["P2_has_type"],
-               URIRef(f"{type_domain}/event/{event_type}")))
+               P2_has_type,
+               intern_uri(f"{type_domain}/event/{event_type}")))
         if date_node_xpath == "":
-            date_node = x.xpath(".//tei:desc/tei:date[@when]")[0]
+            date_node = xpath(x, ".//tei:desc/tei:date[@when]")[0]
         else:
-            date_node = x.xpath(date_node_xpath, namespaces=NSMAP)[0]
+            date_node = xpath(x, date_node_xpath)[0]
         begin, end = extract_begin_end(date_node)
         if begin:
             ts_uri = URIRef(f"{event_uri}/time-span")
-            g.add((ts_uri, RDF.type, CIDOC["E52_Time-Span"]))
-            g += create_e52(ts_uri, begin_of_begin=begin, end_of_end=begin)
+            create_e52(ts_uri, begin_of_begin=begin, end_of_end=begin, sink=g)
         if end:
             ts_uri = URIRef(f"{event_uri}/time-span")
             label = date_node.attrib["when"]
             g.add((ts_uri, RDFS.label, Literal(label, lang=default_lang)))
-            g += create_e52(ts_uri, begin_of_begin=end, end_of_end=end)
+            create_e52(ts_uri, begin_of_begin=end, end_of_end=end, sink=g)
     return g
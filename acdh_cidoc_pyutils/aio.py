@@ -0,0 +1,126 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable
+
+import lxml.etree as ET
+from rdflib import Graph
+from acdh_cidoc_pyutils.namespaces import NSMAP
+from acdh_cidoc_pyutils.stream import ENTITY_TAGS, convert_entity
+
+_DONE = object()
+
+
+def load_entities(source, tags=ENTITY_TAGS, huge_tree=False) -> list:
+    """reads and parses `source` (a path or a file-like object) and returns all
+    its (also nested) entity elements in document order"""
+    if hasattr(source, "read"):
+        data = source.read()
+    else:
+        with open(source, "rb") as f:
+            data = f.read()
+    # lxml parsers must not be shared between threads
+    parser = ET.XMLParser(huge_tree=huge_tree)
+    root = ET.fromstring(data, parser=parser)
+    qualified_tags = [f"{{{NSMAP['tei']}}}{tag}" for tag in tags]
+    return list(root.iter(*qualified_tags))
+
+
+async def aiter_files(
+    sources,
+    tags=ENTITY_TAGS,
+    concurrency=8,
+    queue_size=None,
+    ordered=False,
+    huge_tree=False,
+    executor=None,
+) -> AsyncIterator:
+    """yields `(source, entities)` for every source while up to `concurrency`
+    files are read and parsed in a thread pool
+
+    at most `queue_size` (default: `concurrency`) parsed files wait for the
+    consumer; with `ordered=True` they are yielded in the order of `sources`,
+    otherwise as soon as they are parsed
+    """
+    loop = asyncio.get_running_loop()
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+    queue = asyncio.Queue(maxsize=queue_size or concurrency)
+    slots = asyncio.Semaphore(concurrency)
+
+    async def load(future):
+        try:
+            result = await future
+        except Exception as e:
+            result = e
+        await queue.put(result)
+        slots.release()
+
+    async def produce():
+        tasks = []
+        try:
+            for source in sources:
+                await slots.acquire()
+                future = loop.run_in_executor(executor, load_entities, source, tags, huge_tree)
+                future = asyncio.ensure_future(_with_source(source, future))
+                if ordered:
+                    future.add_done_callback(lambda _: slots.release())
+                    await queue.put(future)
+                else:
+                    tasks.append(asyncio.ensure_future(load(future)))
+            await asyncio.gather(*tasks)
+        except Exception as e:
+            await queue.put(e)
+        await queue.put(_DONE)
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, asyncio.Future):
+                item = await item
+            if isinstance(item, Exception):
+                raise item
+            yield item
+        await producer
+    finally:
+        producer.cancel()
+        if own_executor:
+            executor.shutdown(wait=False)
+
+
+async def _with_source(source, future):
+    return source, await future
+
+
+async def aconvert_files(
+    sources,
+    builders: dict,
+    domain: str,
+    sink=None,
+    subject_factory: Callable = None,
+    concurrency=8,
+    queue_size=None,
+    ordered=False,
+    huge_tree=False,
+    executor=None,
+):
+    g = Graph() if sink is None else sink
+    async for source, entities in aiter_files(
+        sources,
+        tags=tuple(builders),
+        concurrency=concurrency,
+        queue_size=queue_size,
+        ordered=ordered,
+        huge_tree=huge_tree,
+        executor=executor,
+    ):
+        for node in entities:
+            convert_entity(node, builders, domain, g, subject_factory)
+    return g
+
+
+def convert_files(sources, builders: dict, domain: str, sink=None, **kwargs):
+    return asyncio.run(aconvert_files(sources, builders, domain, sink=sink, **kwargs))
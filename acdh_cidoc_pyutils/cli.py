@@ -0,0 +1,278 @@
+import argparse
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from rdflib import URIRef
+
+from acdh_cidoc_pyutils.extsort import DEFAULT_MEMORY_LIMIT, sort_unique
+from acdh_cidoc_pyutils.indexes import build_reference_index
+from acdh_cidoc_pyutils.mapping import BUILDER_NAMES, CompiledMapping, compile_mapping
+from acdh_cidoc_pyutils.parallel import convert_parallel
+from acdh_cidoc_pyutils.sqlite_store import SQLiteSink
+from acdh_cidoc_pyutils.stream import convert_entity, iter_entities
+from acdh_cidoc_pyutils.writers import (
+    COMPRESSION_SUFFIXES,
+    NQuadsWriter,
+    NTriplesWriter,
+    TurtleWriter,
+    parse_ntriples_file,
+)
+
+FORMATS = ("nt", "nq", "ttl", "sqlite")
+FORMAT_SUFFIXES = {".nt": "nt", ".nq": "nq", ".ttl": "ttl", ".sqlite": "sqlite", ".db": "sqlite"}
+DEFAULT_BUILDERS = {
+    "person": ("appellations", "identifiers", "occupations", "affiliations", "birth", "death", "events"),
+    "place": ("appellations", "identifiers", "coordinates"),
+    "org": ("appellations", "identifiers"),
+}
+_SIZE_UNITS = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+
+def parse_builder_selection(values: list) -> dict:
+    selection = dict(DEFAULT_BUILDERS)
+    for value in values or []:
+        tag, _, names = value.partition("=")
+        names = tuple(x.strip() for x in names.split(",") if x.strip())
+        for name in names:
+            if name not in BUILDER_NAMES:
+                raise ValueError(f"unknown builder {name!r}, choose from {', '.join(BUILDER_NAMES)}")
+        selection[tag.strip()] = names
+    return selection
+
+
+def parse_size(value: str) -> int:
+    value = value.strip().upper().rstrip("B")
+    if value and value[-1] in _SIZE_UNITS:
+        return int(float(value[:-1]) * _SIZE_UNITS[value[-1]])
+    return int(value)
+
+
+def expand_inputs(patterns: list) -> list:
+    sources = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True))
+        if not matches:
+            raise FileNotFoundError(f"no input files match {pattern!r}")
+        sources.extend(x for x in matches if x not in sources)
+    return sources
+
+
+def guess_format(output: str) -> str:
+    root, ext = os.path.splitext(output)
+    if ext in COMPRESSION_SUFFIXES:
+        ext = os.path.splitext(root)[1]
+    return FORMAT_SUFFIXES.get(ext, "nt")
+
+
+def _open_sink(output, output_format, graph=None):
+    destination = sys.stdout.buffer if output == "-" else output
+    if output_format == "nt":
+        return NTriplesWriter(destination)
+    if output_format == "nq":
+        return NQuadsWriter(destination, graph=URIRef(graph) if graph else None)
+    if output_format == "ttl":
+        return TurtleWriter(destination)
+    if output == "-":
+        raise ValueError("sqlite output needs a file name")
+    return SQLiteSink(output)
+
+
+def _report(message: str):
+    print(message, file=sys.stderr, flush=True)
+
+
+def _convert_sequential(sources, mapping: CompiledMapping, sink, progress=False, huge_tree=False):
+    start = time.perf_counter()
+    total = 0
+    for i, source in enumerate(sources, start=1):
+        entities = 0
+        for node in iter_entities(source, tags=tuple(mapping.builders), huge_tree=huge_tree):
+            convert_entity(node, mapping.builders, mapping.domain, sink, mapping.subject_factory)
+            entities += 1
+        total += entities
+        if progress:
+            triples = getattr(sink, "count", None)
+            triples = "" if triples is None else f", {triples} triples so far"
+            _report(
+                f"[{i}/{len(sources)}] {source}: {entities} entities{triples} "
+                f"({time.perf_counter() - start:.1f}s)"
+            )
+    return total
+
+
+def _convert_workers(sources, mapping: CompiledMapping, tmp_dir, args, progress=False):
+    start = time.perf_counter()
+    done = []
+
+    def report(entry):
+        done.append(entry)
+        _report(
+            f"[shard {len(done)}] {entry['source']} {entry['start']}-{entry['stop'] or ''}: "
+            f"{entry['entities']} entities, {entry['triples']} triples "
+            f"({time.perf_counter() - start:.1f}s)"
+        )
+
+    return convert_parallel(
+        sources,
+        mapping.builders,
+        mapping.domain,
+        tmp_dir,
+        max_workers=args.workers,
+        entities_per_shard=args.entities_per_shard,
+        subject_factory=mapping.subject_factory,
+        compression=None,
+        progress=report if progress else None,
+        huge_tree=args.huge_tree,
+    )
+
+
+def _append_shard(entry: dict, sink, output_format: str):
+    with open(entry["shard"], "rb") as f:
+        if output_format == "nt":
+            # the shard is N-Triples already
+            sink.flush()
+            shutil.copyfileobj(f, sink.stream)
+            sink.count += entry["triples"]
+        else:
+            parse_ntriples_file(f, sink)
+
+
+def _report_references(ref_index, limit=20):
+    unresolved = ref_index.report()
+    _report(
+        f"{ref_index.checked} references checked against {len(ref_index)} ids, "
+        f"{len(unresolved)} unresolved"
+    )
+    for entry in unresolved[:limit]:
+        _report(f"  {entry['ref']}: {entry['count']}x, e.g. {', '.join(entry['referrers'])}")
+    if len(unresolved) > limit:
+        _report(f"  ... and {len(unresolved) - limit} more")
+
+
+def mapping_from_args(args, ref_index=None) -> CompiledMapping:
+    if args.mapping:
+        return compile_mapping(args.mapping, ref_index=ref_index)
+    if not args.domain:
+        raise ValueError("either --domain or --mapping is needed")
+    selection = parse_builder_selection(args.builders)
+    return compile_mapping({
+        "domain": args.domain,
+        "type_domain": args.type_domain,
+        "lang": args.lang,
+        "entities": {tag: [{"builder": x} for x in names] for tag, names in selection.items()},
+    }, ref_index=ref_index)
+
+
+def convert(args) -> int:
+    sources = expand_inputs(args.inputs)
+    ref_index = None
+    if args.check_refs:
+        if args.workers > 1:
+            raise ValueError("--check-refs is only supported with --workers 1")
+        ref_index = build_reference_index(*sources, huge_tree=args.huge_tree)
+    mapping = mapping_from_args(args, ref_index=ref_index)
+    output_format = args.format or guess_format(args.output)
+    if args.unique and output_format != "nt":
+        raise ValueError("--unique is only supported for N-Triples output")
+    try:
+        return _convert(sources, mapping, output_format, args)
+    finally:
+        if ref_index is not None:
+            _report_references(ref_index)
+
+
+def _convert(sources, mapping: CompiledMapping, output_format: str, args) -> int:
+    with tempfile.TemporaryDirectory(dir=args.tmp_dir) as tmp_dir:
+        if args.unique:
+            # write everything unsorted first, sort_unique creates the final output
+            shard = os.path.join(tmp_dir, "unsorted.nt")
+            shards = [shard]
+            if args.workers > 1:
+                manifest = _convert_workers(sources, mapping, tmp_dir, args, args.progress)
+                shards = [x["shard"] for x in manifest]
+            else:
+                with NTriplesWriter(shard) as sink:
+                    _convert_sequential(sources, mapping, sink, args.progress, args.huge_tree)
+            destination = sys.stdout.buffer if args.output == "-" else args.output
+            count = sort_unique(shards, destination, memory_limit=args.memory_limit, tmp_dir=tmp_dir)
+            if args.progress:
+                _report(f"{count} unique triples written to {args.output}")
+            return 0
+        sink = _open_sink(args.output, output_format, args.graph)
+        try:
+            if args.workers > 1:
+                manifest = _convert_workers(sources, mapping, tmp_dir, args, args.progress)
+                for entry in manifest:
+                    _append_shard(entry, sink, output_format)
+            else:
+                _convert_sequential(sources, mapping, sink, args.progress, args.huge_tree)
+        finally:
+            sink.close()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="cidoc-pyutils", description="create CIDOC CRMish RDF from TEI files"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    conv = subparsers.add_parser("convert", help="convert TEI listPerson/listPlace/listOrg files")
+    conv.add_argument("inputs", nargs="+", help="TEI files or glob patterns (quote them, '**' works)")
+    conv.add_argument("-o", "--output", required=True, help="output file ('-' for stdout)")
+    conv.add_argument("--domain", help="base URI of the entities, e.g. https://foo/bar/")
+    conv.add_argument("--type-domain", help="base URI of the E55_Types (default: {domain}/types/)")
+    conv.add_argument(
+        "--builders", action="append", metavar="TAG=NAME[,NAME...]",
+        help=(
+            "builders to run per TEI element, overrides the defaults for this element, "
+            f"e.g. 'person=appellations,birth' ('org=' skips orgs); names: {', '.join(BUILDER_NAMES)}"
+        ),
+    )
+    conv.add_argument(
+        "--mapping", help="JSON or TOML mapping file (replaces --domain, --type-domain, --builders and --lang)"
+    )
+    conv.add_argument("--lang", default="de", help="default language of the labels (default: de)")
+    conv.add_argument(
+        "--format", choices=FORMATS,
+        help="output format (default: guessed from the output file name, .gz/.xz compress it)",
+    )
+    conv.add_argument("--graph", help="graph URI used for N-Quads output")
+    conv.add_argument("-w", "--workers", type=int, default=1, help="number of worker processes (default: 1)")
+    conv.add_argument("--entities-per-shard", type=int, help="split files into shards of this many entities")
+    conv.add_argument(
+        "--unique", action="store_true", help="write the triples sorted and without duplicates"
+    )
+    conv.add_argument(
+        "--memory-limit", type=parse_size, default=DEFAULT_MEMORY_LIMIT,
+        help="memory used for sorting/deduplication before spilling to disk, e.g. 512M (default: 256M)",
+    )
+    conv.add_argument("--tmp-dir", help="directory for temporary files")
+    conv.add_argument("--huge-tree", action="store_true", help="allow very deep trees and very long texts")
+    conv.add_argument("--progress", action="store_true", help="report progress on stderr")
+    conv.add_argument(
+        "--check-refs", action="store_true",
+        help="report place/org references which match no xml:id of the input files on stderr",
+    )
+    conv.set_defaults(func=convert)
+    return parser
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        return args.func(args)
+    except (FileNotFoundError, ValueError) as e:
+        parser.exit(2, f"{parser.prog}: error: {e}\n")
+    except BrokenPipeError:
+        # output piped into e.g. `head`
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+from array import array
+
+from rdflib import Graph
+
+
+class TermDictionary:
+    """maps every distinct URIRef/Literal/BNode to a (consecutive) integer id and back"""
+
+    def __init__(self):
+        self._ids = {}
+        self._terms = []
+
+    def id(self, term) -> int:
+        try:
+            return self._ids[term]
+        except KeyError:
+            term_id = len(self._terms)
+            self._ids[term] = term_id
+            self._terms.append(term)
+            return term_id
+
+    def get_id(self, term) -> int:
+        return self._ids.get(term)
+
+    def term(self, term_id: int):
+        return self._terms[term_id]
+
+    def __contains__(self, term) -> bool:
+        return term in self._ids
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+
+def pack_ids(s: int, p: int, o: int) -> int:
+    """packs an id triple into a single int (ids below 2**32)"""
+    return (s << 64) | (p << 32) | o
+
+
+def unpack_ids(key: int) -> tuple:
+    return key >> 64, (key >> 32) & 0xFFFFFFFF, key & 0xFFFFFFFF
+
+
+class CompactTripleBuffer:
+    """sink that stores triples as integer id triples in a flat `array('q')`
+
+    the terms live once in a (possibly shared) `TermDictionary`, rdflib terms are
+    only handed out again when iterating or calling `to_graph()`/`write()`;
+    with `dedup=True` a triple is only stored once, the triples seen so far are
+    kept as a set of packed ints (see `pack_ids`), which is also built (once)
+    for membership tests
+    """
+
+    def __init__(self, dictionary: TermDictionary = None, dedup=False):
+        self.dictionary = TermDictionary() if dictionary is None else dictionary
+        self.data = array("q")
+        self.dedup = dedup
+        self._keys = set() if dedup else None
+
+    def add(self, triple):
+        term_id = self.dictionary.id
+        return self.add_ids(term_id(triple[0]), term_id(triple[1]), term_id(triple[2]))
+
+    def add_ids(self, s: int, p: int, o: int):
+        if self._keys is not None:
+            key = (s << 64) | (p << 32) | o
+            if key not in self._keys:
+                self._keys.add(key)
+            elif self.dedup:
+                return self
+        self.data.extend((s, p, o))
+        return self
+
+    def id_triples(self):
+        data = self.data
+        for i in range(0, len(data), 3):
+            yield data[i], data[i + 1], data[i + 2]
+
+    def _packed(self):
+        data = self.data
+        for i in range(0, len(data), 3):
+            yield (data[i] << 64) | (data[i + 1] << 32) | data[i + 2]
+
+    def deduplicate(self) -> int:
+        """drops repeated triples (keeping the first occurrence), returns the number removed"""
+        before = len(self)
+        unique = dict.fromkeys(self._packed())
+        self.data = array("q")
+        for key in unique:
+            self.data.extend(unpack_ids(key))
+        if self._keys is not None:
+            self._keys = set(unique)
+        return before - len(self)
+
+    def write(self, sink):
+        term = self.dictionary._terms
+        for s, p, o in self.id_triples():
+            sink.add((term[s], term[p], term[o]))
+        return sink
+
+    def to_graph(self, graph: Graph = None) -> Graph:
+        return self.write(Graph() if graph is None else graph)
+
+    def clear(self):
+        self.data = array("q")
+        self._keys = set() if self.dedup else None
+
+    def __iter__(self):
+        term = self.dictionary._terms
+        for s, p, o in self.id_triples():
+            yield term[s], term[p], term[o]
+
+    def __contains__(self, triple) -> bool:
+        get_id = self.dictionary.get_id
+        ids = (get_id(triple[0]), get_id(triple[1]), get_id(triple[2]))
+        if None in ids:
+            return False
+        if self._keys is None:
+            # built once, kept up to date by add_ids from now on
+            self._keys = set(self._packed())
+        return pack_ids(*ids) in self._keys
+
+    def __len__(self) -> int:
+        return len(self.data) // 3
@@ -0,0 +1,121 @@
+import gzip
+import heapq
+import lzma
+import os
+import tempfile
+
+from acdh_cidoc_pyutils.writers import COMPRESSION_SUFFIXES, open_output
+
+DEFAULT_MEMORY_LIMIT = 256 * 1024 * 1024
+DEFAULT_MAX_MERGE = 64
+# rough per line overhead of a bytes object stored in a set
+_LINE_OVERHEAD = 100
+
+
+def open_input(source, compression=None):
+    if not isinstance(source, (str, os.PathLike)):
+        return source, False
+    if compression is None:
+        compression = COMPRESSION_SUFFIXES.get(os.path.splitext(source)[1])
+    if compression == "gzip":
+        return gzip.open(source, "rb"), True
+    if compression == "lzma":
+        return lzma.open(source, "rb"), True
+    if compression is None:
+        return open(source, "rb"), True
+    raise ValueError(f"unknown compression: {compression}")
+
+
+def iter_statements(source):
+    stream, should_close = open_input(source)
+    try:
+        for line in stream:
+            line = line.strip()
+            if line and not line.startswith(b"#"):
+                yield line + b"\n"
+    finally:
+        if should_close:
+            stream.close()
+
+
+def _write_run(lines, tmp_dir) -> str:
+    fd, path = tempfile.mkstemp(suffix=".nt", dir=tmp_dir)
+    with os.fdopen(fd, "wb") as f:
+        f.writelines(sorted(lines))
+    return path
+
+
+def _merge(paths, destination):
+    files = [open(x, "rb") for x in paths]
+    count = 0
+    try:
+        previous = None
+        for line in heapq.merge(*files):
+            if line != previous:
+                destination.write(line)
+                count += 1
+                previous = line
+    finally:
+        for f in files:
+            f.close()
+    return count
+
+
+def sort_unique(
+    sources,
+    destination,
+    memory_limit=DEFAULT_MEMORY_LIMIT,
+    tmp_dir=None,
+    compression=None,
+    max_merge=DEFAULT_MAX_MERGE,
+) -> int:
+    """writes the statements of the N-Triples (or N-Quads) `sources` sorted and
+    without duplicates to `destination`, returns the number of written lines
+
+    lines are collected until `memory_limit` (bytes, roughly) is reached and then
+    spilled as sorted, deduplicated runs into `tmp_dir`; the runs are k-way
+    merged (at most `max_merge` files at once)
+
+    blank node labels are compared as they are, so shards must not reuse labels
+    for different nodes
+    """
+    runs = []
+    lines = set()
+    size = 0
+    try:
+        for source in sources:
+            for line in iter_statements(source):
+                if line in lines:
+                    continue
+                lines.add(line)
+                size += len(line) + _LINE_OVERHEAD
+                if size >= memory_limit:
+                    runs.append(_write_run(lines, tmp_dir))
+                    lines = set()
+                    size = 0
+        if runs and lines:
+            runs.append(_write_run(lines, tmp_dir))
+            lines = set()
+        while len(runs) > max_merge:
+            group, runs = runs[:max_merge], runs[max_merge:]
+            fd, path = tempfile.mkstemp(suffix=".nt", dir=tmp_dir)
+            runs.append(path)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    _merge(group, f)
+            finally:
+                for x in group:
+                    os.remove(x)
+        stream, should_close = open_output(destination, compression)
+        try:
+            if runs:
+                return _merge(runs, stream)
+            stream.writelines(sorted(lines))
+            return len(lines)
+        finally:
+            if should_close:
+                stream.close()
+    finally:
+        for x in runs:
+            if os.path.exists(x):
+                os.remove(x)
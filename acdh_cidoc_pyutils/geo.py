@@ -0,0 +1,161 @@
+from rdflib import Graph, Literal
+from acdh_cidoc_pyutils.namespaces import GEO_WKT_LITERAL, NSMAP, P168_place_is_defined_by
+from acdh_cidoc_pyutils.xpath import xpath
+
+DEFAULT_COORDS_XPATH = ".//tei:geo[1]"
+_GEO_TAG = f"{{{NSMAP['tei']}}}geo"
+
+STATUS_OK = 0
+STATUS_MISSING = 1
+STATUS_FORMAT = 2
+STATUS_NOT_NUMERIC = 3
+STATUS_OUT_OF_RANGE = 4
+STATUS_SWAPPED = 5
+STATUS_LABELS = {
+    STATUS_OK: "ok",
+    STATUS_MISSING: "missing",
+    STATUS_FORMAT: "format",
+    STATUS_NOT_NUMERIC: "not numeric",
+    STATUS_OUT_OF_RANGE: "out of range",
+    STATUS_SWAPPED: "swapped",
+}
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError(
+            "bulk coordinate parsing needs numpy: pip install acdh-cidoc-pyutils[numpy]"
+        )
+    return numpy
+
+
+def _to_float(np, values: list):
+    try:
+        return np.array(values, dtype=str).astype(np.float64)
+    except ValueError:
+        pass
+    result = np.empty(len(values), dtype=np.float64)
+    for i, value in enumerate(values):
+        try:
+            result[i] = float(value)
+        except ValueError:
+            result[i] = np.nan
+    return result
+
+
+class Coordinates:
+    """coordinates of many places, parsed and validated at once
+
+    `lat`/`lng` are float arrays (NaN where not parseable), `status` holds one
+    STATUS_* code per row, `texts` the (lat, lng) strings as written in the source
+    """
+
+    def __init__(self, subjects: list, texts: list, lat, lng, status):
+        self.subjects = subjects
+        self.texts = texts
+        self.lat = lat
+        self.lng = lng
+        self.status = status
+
+    def malformed(self) -> list:
+        np = _numpy()
+        return [
+            (self.subjects[i], STATUS_LABELS[int(self.status[i])], self.texts[i])
+            for i in np.flatnonzero(self.status != STATUS_OK)
+        ]
+
+    def counts(self) -> dict:
+        np = _numpy()
+        codes, counts = np.unique(self.status, return_counts=True)
+        return {STATUS_LABELS[int(x)]: int(y) for x, y in zip(codes, counts)}
+
+    def __len__(self) -> int:
+        return len(self.subjects)
+
+
+def extract_coordinates(
+    items,
+    coords_xpath=DEFAULT_COORDS_XPATH,
+    separator=" ",
+    inverse=False,
+) -> Coordinates:
+    """`items` are (subject, node) pairs, like the arguments of `coordinates_to_p168`"""
+    np = _numpy()
+    subjects = []
+    texts = []
+    status = []
+    for subj, node in items:
+        subjects.append(subj)
+        if coords_xpath == DEFAULT_COORDS_XPATH:
+            # the first tei:geo descendant, without evaluating an XPath
+            geo = next(node.iterdescendants(_GEO_TAG), None)
+            text = None if geo is None else geo.text
+        else:
+            nodes = xpath(node, coords_xpath)
+            text = getattr(nodes[0], "text", None) if nodes else None
+        if text is None:
+            texts.append(None)
+            status.append(STATUS_MISSING)
+            continue
+        parts = text.split(separator)
+        if len(parts) != 2:
+            texts.append(text)
+            status.append(STATUS_FORMAT)
+            continue
+        lat, lng = parts
+        if inverse:
+            lat, lng = lng, lat
+        texts.append((lat, lng))
+        status.append(STATUS_OK)
+    status = np.array(status, dtype=np.int8)
+    rows = np.flatnonzero(status == STATUS_OK)
+    lat = np.full(len(subjects), np.nan)
+    lng = np.full(len(subjects), np.nan)
+    lat[rows] = _to_float(np, [texts[i][0] for i in rows])
+    lng[rows] = _to_float(np, [texts[i][1] for i in rows])
+    ok = status == STATUS_OK
+    numeric = np.isfinite(lat) & np.isfinite(lng)
+    status[ok & ~numeric] = STATUS_NOT_NUMERIC
+    ok &= numeric
+    with np.errstate(invalid="ignore"):
+        in_range = (np.abs(lat) <= 90) & (np.abs(lng) <= 180)
+        swapped = (np.abs(lat) > 90) & (np.abs(lat) <= 180) & (np.abs(lng) <= 90)
+    status[ok & swapped] = STATUS_SWAPPED
+    status[ok & ~in_range & ~swapped] = STATUS_OUT_OF_RANGE
+    return Coordinates(subjects, texts, lat, lng, status)
+
+
+def coordinates_to_p168_bulk(
+    items,
+    coords_xpath=DEFAULT_COORDS_XPATH,
+    separator=" ",
+    inverse=False,
+    validate=True,
+    fix_swapped=False,
+    sink=None,
+):
+    """like `coordinates_to_p168` for many (subject, node) pairs at once
+
+    returns the sink and the `Coordinates`; with `validate` (default) only rows
+    with numeric, in range values get a P168 triple, `fix_swapped` additionally
+    emits rows whose latitude/longitude look swapped in the right order
+    """
+    g = Graph() if sink is None else sink
+    coordinates = extract_coordinates(items, coords_xpath, separator, inverse)
+    for i, code in enumerate(coordinates.status.tolist()):
+        if code == STATUS_SWAPPED and fix_swapped:
+            lng, lat = coordinates.texts[i]
+        elif code == STATUS_OK or (not validate and code > STATUS_FORMAT):
+            lat, lng = coordinates.texts[i]
+        else:
+            continue
+        g.add(
+            (
+                coordinates.subjects[i],
+                P168_place_is_defined_by,
+                Literal(f"Point({lng} {lat})", datatype=GEO_WKT_LITERAL),
+            )
+        )
+    return g, coordinates
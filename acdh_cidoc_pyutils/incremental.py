@@ -0,0 +1,185 @@
+import hashlib
+import json
+import sqlite3
+import zlib
+from importlib.metadata import PackageNotFoundError, version
+from typing import Callable
+
+import lxml.etree as ET
+from lxml.etree import Element
+from rdflib import Graph
+from acdh_cidoc_pyutils.stream import default_subject, iter_entities
+from acdh_cidoc_pyutils.writers import parse_ntriples, triple_to_nt
+
+try:
+    LIBRARY_VERSION = version("acdh_cidoc_pyutils")
+except PackageNotFoundError:
+    LIBRARY_VERSION = "unknown"
+
+
+class _TripleList(list):
+    def add(self, triple):
+        self.append(triple)
+
+
+def _stable_value(value):
+    if isinstance(value, (str, int, float, bool, type(None))):
+        return f"{value}"
+    if isinstance(value, (list, tuple)):
+        return [_stable_value(x) for x in value]
+    if isinstance(value, dict):
+        return {f"{key}": _stable_value(x) for key, x in sorted(value.items())}
+    cache_key = getattr(value, "cache_key", None)
+    if cache_key is None:
+        # repr() of most objects contains their memory address
+        raise ValueError(
+            f"builder option of type {type(value).__qualname__} can't be cached, "
+            "it needs a stable cache_key() method"
+        )
+    return cache_key()
+
+
+def builder_signature(builder: Callable):
+    func = getattr(builder, "func", builder)
+    if not hasattr(func, "__qualname__"):
+        # callable object, e.g. mapping.EntityFunction
+        func = type(func)
+    signature = {
+        "builder": f"{func.__module__}.{func.__qualname__}",
+        "args": [_stable_value(x) for x in getattr(builder, "args", ())],
+        "keywords": {
+            key: _stable_value(value) for key, value in sorted(getattr(builder, "keywords", {}).items())
+        },
+    }
+    target = getattr(builder, "func", builder)
+    if hasattr(target, "cache_key"):
+        signature["key"] = target.cache_key()
+    if hasattr(target, "builders"):
+        signature["builders"] = [builder_signature(x) for x in target.builders]
+    return signature
+
+
+class EntityCache:
+    """on-disk (SQLite) cache of the triples generated per entity
+
+    an entry is reused as long as the entity's canonical XML, the builder
+    parameters (`params`) and the library version are unchanged
+    """
+
+    def __init__(self, path: str, params=None, commit_every=1000):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS entities (
+                key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                triples BLOB NOT NULL
+            )"""
+        )
+        self.salt = json.dumps(
+            {"params": params, "version": LIBRARY_VERSION}, sort_keys=True, default=str
+        ).encode("utf-8")
+        self.commit_every = commit_every
+        self.hits = 0
+        self.misses = 0
+        self._pending = 0
+        self._seen = set()
+
+    def fingerprint(self, node: Element, salt: bytes = b"") -> str:
+        digest = hashlib.sha256(self.salt)
+        digest.update(salt)
+        digest.update(ET.tostring(node, method="c14n"))
+        return digest.hexdigest()
+
+    def get(self, key: str, fingerprint: str):
+        self._seen.add(key)
+        row = self.conn.execute(
+            "SELECT triples FROM entities WHERE key = ? AND fingerprint = ?",
+            (key, fingerprint),
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def put(self, key: str, fingerprint: str, data: str):
+        self._seen.add(key)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO entities (key, fingerprint, triples) VALUES (?, ?, ?)",
+            (key, fingerprint, zlib.compress(data.encode("utf-8"))),
+        )
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.commit()
+
+    def evict_unseen(self) -> int:
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS seen (key TEXT PRIMARY KEY)")
+        self.conn.execute("DELETE FROM seen")
+        self.conn.executemany("INSERT INTO seen (key) VALUES (?)", ((x,) for x in self._seen))
+        deleted = self.conn.execute(
+            "DELETE FROM entities WHERE key NOT IN (SELECT key FROM seen)"
+        ).rowcount
+        self.commit()
+        return deleted
+
+    def commit(self):
+        self.conn.commit()
+        self._pending = 0
+
+    def close(self):
+        self.commit()
+        self.conn.close()
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM entities").fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def convert_incremental(
+    source,
+    builders: dict,
+    domain: str,
+    cache: EntityCache,
+    sink=None,
+    subject_factory: Callable = None,
+    evict=True,
+    huge_tree=False,
+):
+    g = Graph() if sink is None else sink
+    salts = {
+        tag: json.dumps([builder_signature(x) for x in value], sort_keys=True).encode("utf-8")
+        for tag, value in builders.items()
+    }
+    for node in iter_entities(source, tags=tuple(builders), huge_tree=huge_tree):
+        tag = node.tag.split("}")[-1]
+        if subject_factory:
+            subj = subject_factory(node)
+        else:
+            subj = default_subject(node, domain)
+        if subj is None:
+            continue
+        key = f"{subj}"
+        fingerprint = cache.fingerprint(node, salts[tag])
+        data = cache.get(key, fingerprint)
+        if data is None:
+            triples = _TripleList()
+            for builder in builders[tag]:
+                builder(subj, node, sink=triples)
+            data = "".join(triple_to_nt(x) for x in triples)
+            cache.put(key, fingerprint, data)
+            for triple in triples:
+                g.add(triple)
+        elif hasattr(g, "write_ntriples"):
+            g.write_ntriples(data)
+        else:
+            parse_ntriples(data, g)
+    if evict:
+        cache.evict_unseen()
+    else:
+        cache.commit()
+    return g
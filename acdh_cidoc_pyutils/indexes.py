@@ -0,0 +1,129 @@
+import hashlib
+import json
+
+import lxml.etree as ET
+from lxml.etree import Element
+from acdh_cidoc_pyutils import make_entity_label
+from acdh_cidoc_pyutils.namespaces import NSMAP
+from acdh_cidoc_pyutils.stream import XML_ID, iter_entities
+from acdh_cidoc_pyutils.xpath import xpath
+
+ORG_TAG = f"{{{NSMAP['tei']}}}org"
+
+
+class LabelIndex:
+    """maps the xml:ids of entities to their preferred label
+
+    build it once (e.g. with `build_org_index`) and pass the same object to all
+    builder calls; `get` accepts references with or without leading '#'
+    """
+
+    def __init__(self, labels: dict = None):
+        self.labels = dict(labels or {})
+        self.hits = 0
+        self.misses = 0
+
+    def add(self, node: Element, name_xpath: str, default_lang="de"):
+        xml_id = node.get(XML_ID)
+        if xml_id is None:
+            return
+        name_nodes = xpath(node, name_xpath)
+        if name_nodes:
+            label, _ = make_entity_label(name_nodes[0], default_lang=default_lang)
+            self.labels[xml_id] = label
+
+    def get(self, ref: str, default=None):
+        label = self.labels.get(ref[1:] if ref.startswith("#") else ref)
+        if label is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return label
+
+    def __contains__(self, ref: str) -> bool:
+        return (ref[1:] if ref.startswith("#") else ref) in self.labels
+
+    def cache_key(self) -> str:
+        """digest of the labels, see `incremental.builder_signature`"""
+        data = json.dumps(self.labels, sort_keys=True).encode("utf-8")
+        return hashlib.sha256(data).hexdigest()
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+
+def build_org_index(
+    *sources, name_xpath="./tei:orgName[1]", default_lang="de", huge_tree=False
+) -> LabelIndex:
+    """collects the labels of all (also nested) tei:org elements of the given
+    documents/elements or files"""
+    index = LabelIndex()
+    for source in sources:
+        if ET.iselement(source) or hasattr(source, "getroot"):
+            entities = source.iter(ORG_TAG)
+        else:
+            # also yields nested orgs
+            entities = iter_entities(source, tags=("org",), huge_tree=huge_tree)
+        for node in entities:
+            index.add(node, name_xpath, default_lang)
+    return index
+
+
+class ReferenceIndex:
+    """set of all known xml:ids, builders passed as `ref_index` record every
+    reference (`@key`/`@ref`) they emit which is not part of it"""
+
+    def __init__(self, ids=None, max_referrers=3):
+        self.ids = set(ids or ())
+        self.max_referrers = max_referrers
+        self.checked = 0
+        self.unresolved = {}
+
+    def check(self, ref: str, referrer=None) -> bool:
+        self.checked += 1
+        if ref in self.ids:
+            return True
+        try:
+            entry = self.unresolved[ref]
+        except KeyError:
+            entry = self.unresolved[ref] = [0, []]
+        entry[0] += 1
+        if referrer is not None and len(entry[1]) < self.max_referrers:
+            entry[1].append(f"{referrer}")
+        return False
+
+    def report(self) -> list:
+        """unresolved references, the most frequent first"""
+        return [
+            {"ref": ref, "count": count, "referrers": referrers}
+            for ref, (count, referrers) in sorted(
+                self.unresolved.items(), key=lambda x: (-x[1][0], x[0])
+            )
+        ]
+
+    def __contains__(self, ref: str) -> bool:
+        return ref in self.ids
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+def build_reference_index(*sources, huge_tree=False, max_referrers=3) -> ReferenceIndex:
+    """collects the xml:ids of all elements of the given files (streamed) or
+    parsed documents/elements"""
+    index = ReferenceIndex(max_referrers=max_referrers)
+    ids = index.ids
+    for source in sources:
+        if ET.iselement(source) or hasattr(source, "getroot"):
+            ids.update(x.get(XML_ID) for x in source.iter() if x.get(XML_ID) is not None)
+            continue
+        for _, node in ET.iterparse(source, events=("end",), huge_tree=huge_tree):
+            xml_id = node.get(XML_ID)
+            if xml_id is not None:
+                ids.add(xml_id)
+            node.clear(keep_tail=False)
+            parent = node.getparent()
+            if parent is not None:
+                while node.getprevious() is not None:
+                    del parent[0]
+    return index
@@ -0,0 +1,240 @@
+import inspect
+import json
+import os
+from functools import partial
+from typing import Callable
+
+import lxml.etree as ET
+from lxml.etree import Element
+from rdflib import URIRef
+from acdh_cidoc_pyutils import (
+    coordinates_to_p168,
+    make_affiliations,
+    make_appellations,
+    make_birth_death_entities,
+    make_e42_identifiers,
+    make_entity,
+    make_entity_label,
+    make_events,
+    make_occupations,
+)
+from acdh_cidoc_pyutils.indexes import build_org_index
+from acdh_cidoc_pyutils.stream import XML_ID, convert_stream
+from acdh_cidoc_pyutils.xpath import get_xpath, xpath
+
+# options holding complete XPath expressions, they are compiled (and checked) up front
+XPATH_OPTIONS = ("coords_xpath", "id_xpath", "org_id_xpath", "org_label_xpath")
+
+
+def _check_xpath(expression: str):
+    try:
+        get_xpath(expression)
+    except ET.XPathError as e:
+        raise ValueError(f"invalid XPath {expression!r}: {e}")
+
+
+def _first_name_node(node: Element):
+    name_nodes = xpath(node, ".//tei:persName[1]")
+    return name_nodes[0] if name_nodes else None
+
+
+# persons without persName are skipped by the following two builders
+def _affiliations(
+    subj: URIRef,
+    node: Element,
+    domain: str,
+    org_id_xpath="./@ref",
+    org_label_xpath="",
+    lang="en",
+    sink=None,
+    entity_index=None,
+    org_index=None,
+    ref_index=None,
+):
+    name_node = _first_name_node(node)
+    if name_node is not None:
+        person_label, _ = make_entity_label(name_node)
+        make_affiliations(
+            subj, node, domain, person_label, org_id_xpath=org_id_xpath,
+            org_label_xpath=org_label_xpath, lang=lang, sink=sink, entity_index=entity_index,
+            org_index=org_index, ref_index=ref_index,
+        )
+    return sink
+
+
+# persons without tei:birth/tei:death get no (made up) E67_Birth/E69_Death
+def _birth_death(
+    subj: URIRef, node: Element, domain: str, event_type="birth", sink=None, entity_index=None, **kwargs
+):
+    if entity_index is None:
+        event_nodes = xpath(node, f".//tei:{event_type}[1]")
+    else:
+        event_nodes = entity_index.get(event_type)
+    if event_nodes and _first_name_node(node) is not None:
+        make_birth_death_entities(
+            subj, node, domain, event_type=event_type, sink=sink, entity_index=entity_index, **kwargs
+        )
+    return sink
+
+
+# make_events needs a @type and a tei:desc/tei:date[@when] per event, others are skipped
+def _events(subj: URIRef, node: Element, type_domain: str, sink=None, entity_index=None, **kwargs):
+    if entity_index is None:
+        events = xpath(node, ".//tei:event")
+    else:
+        events = entity_index["event"]
+    complete = [
+        x for x in events if xpath(x, "@type") and xpath(x, "./tei:desc/tei:date[@when]")
+    ]
+    if complete:
+        entity_index = {**(entity_index or {}), "event": complete}
+        make_events(subj, node, type_domain, sink=sink, entity_index=entity_index, **kwargs)
+    return sink
+
+
+# name: (builder, function whose signature lists the accepted options, preset options)
+BUILDERS = {
+    "appellations": (make_appellations, make_appellations, {}),
+    "identifiers": (make_e42_identifiers, make_e42_identifiers, {}),
+    "occupations": (make_occupations, make_occupations, {}),
+    "affiliations": (_affiliations, _affiliations, {}),
+    "birth": (_birth_death, make_birth_death_entities, {}),
+    "death": (_birth_death, make_birth_death_entities, {"event_type": "death", "default_prefix": "Tod von"}),
+    "events": (_events, make_events, {}),
+    "coordinates": (coordinates_to_p168, coordinates_to_p168, {}),
+}
+BUILDER_NAMES = tuple(BUILDERS)
+
+
+def make_builder(name: str, domain: str, type_domain: str, lang="de", **options) -> Callable:
+    try:
+        builder, signature_of, presets = BUILDERS[name]
+    except KeyError:
+        raise ValueError(f"unknown builder {name!r}, choose from {', '.join(BUILDER_NAMES)}")
+    parameters = inspect.signature(signature_of).parameters
+    kwargs = dict(presets)
+    for key, value in (("domain", domain), ("type_domain", type_domain), ("default_lang", lang)):
+        if key in parameters and value is not None:
+            kwargs[key] = value
+    for key, value in options.items():
+        if key not in parameters or key in ("subj", "node", "sink", "entity_index"):
+            raise ValueError(f"builder {name!r} has no option {key!r}")
+        if key in XPATH_OPTIONS and value:
+            _check_xpath(value)
+        if key == "org_index" and isinstance(value, (str, list)):
+            # file name(s) in mapping files
+            value = build_org_index(*([value] if isinstance(value, str) else value))
+        kwargs[key] = value
+    return partial(builder, **kwargs)
+
+
+class EntityFunction:
+    """runs all builders of one entity type through `make_entity`, those which
+    support it share one `index_entity` walk over the entity"""
+
+    def __init__(self, builders: list):
+        self.builders = list(builders)
+
+    def __call__(self, subj: URIRef, node: Element, sink=None, entity_index=None):
+        return make_entity(subj, node, self.builders, sink=sink, entity_index=entity_index)
+
+
+class SubjectFactory:
+    """builds the subject URI of an entity from `template`, `{id}` is the
+    entity's xml:id (or the first result of `id_xpath`)"""
+
+    def __init__(self, domain: str, template="{domain}{id}", id_xpath=None, lower=False):
+        self.domain = domain
+        self.template = template
+        self.id_xpath = id_xpath
+        self.lower = lower
+        if id_xpath:
+            _check_xpath(id_xpath)
+
+    def __call__(self, node: Element):
+        if self.id_xpath:
+            values = xpath(node, self.id_xpath)
+            value = f"{values[0]}" if values else None
+        else:
+            value = node.get(XML_ID)
+        if value is None:
+            return None
+        if self.lower:
+            value = value.lower()
+        return URIRef(self.template.format(domain=self.domain, id=value))
+
+
+class CompiledMapping:
+    def __init__(self, domain: str, builders: dict, subject_factory: SubjectFactory):
+        self.domain = domain
+        self.builders = builders
+        self.subject_factory = subject_factory
+
+    def convert(self, source, sink=None, huge_tree=False):
+        return convert_stream(
+            source, self.builders, self.domain, sink=sink,
+            subject_factory=self.subject_factory, huge_tree=huge_tree,
+        )
+
+
+def load_mapping(source) -> dict:
+    if isinstance(source, dict):
+        return source
+    if os.path.splitext(source)[1] == ".toml":
+        try:
+            import tomllib
+        except ImportError:  # python < 3.11
+            import tomli as tomllib
+        with open(source, "rb") as f:
+            return tomllib.load(f)
+    with open(source, "rb") as f:
+        return json.load(f)
+
+
+def compile_mapping(config, ref_index=None) -> CompiledMapping:
+    """compiles a mapping (dict, JSON or TOML file) into builders per entity type,
+    a `ReferenceIndex` is handed to all builders which check references
+
+    ```toml
+    domain = "https://foo/bar/"
+    type_domain = "https://foo/bar/types/"  # default: {domain}types/
+    lang = "de"
+    subject = {template = "{domain}{id}", lower = false}  # id_xpath = "@n"
+
+    [[entities.person]]
+    builder = "appellations"
+    [[entities.person]]
+    builder = "birth"
+    place_id_xpath = "//tei:placeName[1]/@key"
+    ```
+    """
+    config = load_mapping(config)
+    try:
+        domain = config["domain"]
+    except KeyError:
+        raise ValueError("mapping needs a 'domain'")
+    type_domain = config.get("type_domain") or f"{domain.rstrip('/')}/types/"
+    lang = config.get("lang", "de")
+    builders = {}
+    for tag, entries in config.get("entities", {}).items():
+        tag_builders = []
+        for entry in entries:
+            options = dict(entry)
+            try:
+                name = options.pop("builder")
+            except KeyError:
+                raise ValueError(f"entry without 'builder' for {tag!r}: {entry}")
+            if ref_index is not None and name in BUILDERS:
+                if "ref_index" in inspect.signature(BUILDERS[name][1]).parameters:
+                    options.setdefault("ref_index", ref_index)
+            tag_builders.append(make_builder(name, domain, type_domain, lang, **options))
+        if tag_builders:
+            builders[tag] = [EntityFunction(tag_builders)]
+    subject = config.get("subject", {})
+    subject_factory = SubjectFactory(
+        domain,
+        template=subject.get("template", "{domain}{id}"),
+        id_xpath=subject.get("id_xpath"),
+        lower=subject.get("lower", False),
+    )
+    return CompiledMapping(domain, builders, subject_factory)
@@ -1,10 +1,39 @@
-from rdflib import Namespace
+from rdflib import Namespace, URIRef
 
 CIDOC = Namespace("http://www.cidoc-crm.org/cidoc-crm/")
 FRBROO = Namespace("https://cidoc-crm.org/frbroo/sites/default/files/FRBR2.4-draft.rdfs#")
 INT = Namespace("https://w3id.org/lso/intro/Vx/#")
 SCHEMA = Namespace("https://schema.org/")
 
+# precomputed terms used by the builders
+GEO_WKT_LITERAL = URIRef("geo:wktLiteral")
+
+E5_Event = CIDOC["E5_Event"]
+E33_E41_Linguistic_Appellation = CIDOC["E33_E41_Linguistic_Appellation"]
+E42_Identifier = CIDOC["E42_Identifier"]
+E52_Time_Span = CIDOC["E52_Time-Span"]
+E55_Type = CIDOC["E55_Type"]
+E67_Birth = CIDOC["E67_Birth"]
+E69_Death = CIDOC["E69_Death"]
+E85_Joining = CIDOC["E85_Joining"]
+E86_Leaving = CIDOC["E86_Leaving"]
+P1_is_identified_by = CIDOC["P1_is_identified_by"]
+P2_has_type = CIDOC["P2_has_type"]
+P4_has_time_span = CIDOC["P4_has_time-span"]
+P7_took_place_at = CIDOC["P7_took_place_at"]
+P14i_performed = CIDOC["P14i_performed"]
+P82a_begin_of_the_begin = CIDOC["P82a_begin_of_the_begin"]
+P82b_end_of_the_end = CIDOC["P82b_end_of_the_end"]
+P98_brought_into_life = CIDOC["P98_brought_into_life"]
+P100_was_death_of = CIDOC["P100_was_death_of"]
+P143_joined = CIDOC["P143_joined"]
+P144_joined_with = CIDOC["P144_joined_with"]
+P145_separated = CIDOC["P145_separated"]
+P146_separated_from = CIDOC["P146_separated_from"]
+P168_place_is_defined_by = CIDOC["P168_place_is_defined_by"]
+
+F51_Pursuit = FRBROO["F51_Pursuit"]
+
 NSMAP = {
     "tei": "http://www.tei-c.org/ns/1.0",
     "xml": "http://www.w3.org/XML/1998/namespace",
@@ -0,0 +1,128 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Callable
+
+import lxml.etree as ET
+from acdh_cidoc_pyutils.namespaces import NSMAP
+from acdh_cidoc_pyutils.stream import default_subject, iter_entities
+from acdh_cidoc_pyutils.writers import NTriplesWriter
+
+SHARD_SUFFIXES = {None: ".nt", "gzip": ".nt.gz", "lzma": ".nt.xz"}
+
+
+def iter_chunks(source, tags, entities_per_shard: int, huge_tree=False):
+    """streams `source` once and yields `(start, stop, data)` for every
+    `entities_per_shard` top-level entities, `data` being their serialized XML"""
+    qualified_tags = {f"{{{NSMAP['tei']}}}{tag}" for tag in tags}
+    chunk = []
+    start = stop = 0
+    for node in iter_entities(source, tags=tags, huge_tree=huge_tree):
+        if any(x.tag in qualified_tags for x in node.iterancestors()):
+            # nested entities are part of their ancestor's chunk
+            continue
+        chunk.append(ET.tostring(node, with_tail=False))
+        stop += 1
+        if len(chunk) == entities_per_shard:
+            yield start, stop, b"".join(chunk)
+            chunk = []
+            start = stop
+    if chunk or stop == 0:
+        yield start, stop, b"".join(chunk)
+
+
+def iter_tasks(sources: list, tags, entities_per_shard: int = None, huge_tree=False):
+    """yields `(source, start, stop, data)`, `data` is None for whole files
+    (read by the worker itself)"""
+    for source in sources:
+        if entities_per_shard is None:
+            yield (source, 0, None, None)
+            continue
+        for start, stop, data in iter_chunks(source, tags, entities_per_shard, huge_tree):
+            yield (source, start, stop, data)
+
+
+def convert_shard(
+    task: tuple,
+    shard_path: str,
+    builders: dict,
+    domain: str,
+    subject_factory: Callable = None,
+    compression=None,
+    huge_tree=False,
+) -> dict:
+    source, start, stop, data = task
+    if data is not None:
+        source_or_chunk = BytesIO(b"<shard>" + data + b"</shard>")
+    else:
+        source_or_chunk = source
+    entities = 0
+    with NTriplesWriter(shard_path, compression=compression) as writer:
+        for node in iter_entities(source_or_chunk, tags=tuple(builders), huge_tree=huge_tree):
+            if subject_factory:
+                subj = subject_factory(node)
+            else:
+                subj = default_subject(node, domain)
+            if subj is None:
+                continue
+            entities += 1
+            for builder in builders[node.tag.split("}")[-1]]:
+                builder(subj, node, sink=writer)
+    return {
+        "source": str(source),
+        "start": start,
+        "stop": stop,
+        "shard": shard_path,
+        "entities": entities,
+        "triples": writer.count,
+    }
+
+
+def _convert_shard(args):
+    return convert_shard(*args)
+
+
+def convert_parallel(
+    sources: list,
+    builders: dict,
+    domain: str,
+    output_dir: str,
+    max_workers: int = None,
+    entities_per_shard: int = None,
+    subject_factory: Callable = None,
+    compression="gzip",
+    progress: Callable = None,
+    huge_tree=False,
+) -> list:
+    os.makedirs(output_dir, exist_ok=True)
+    suffix = SHARD_SUFFIXES[compression]
+    # files are read only once (here, for chunks), chunks are handed to the
+    # workers as they are read, at most `max_pending` of them wait in memory
+    max_pending = 2 * (max_workers or os.cpu_count() or 1)
+    manifest = []
+    pending = deque()
+
+    def collect():
+        entry = pending.popleft().result()
+        manifest.append(entry)
+        if progress:
+            progress(entry)
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for i, task in enumerate(iter_tasks(sources, tuple(builders), entities_per_shard, huge_tree)):
+            if len(pending) >= max_pending:
+                collect()
+            job = (
+                task,
+                os.path.join(output_dir, f"shard-{i:05d}{suffix}"),
+                builders,
+                domain,
+                subject_factory,
+                compression,
+                huge_tree,
+            )
+            pending.append(executor.submit(_convert_shard, job))
+        while pending:
+            collect()
+    return manifest
@@ -0,0 +1,41 @@
+from rdflib import Graph, Literal, URIRef, RDF, RDFS
+from acdh_cidoc_pyutils.namespaces import E55_Type
+
+
+class TypeRegistry:
+    """keeps track of already emitted E55_Type definitions during a conversion run
+
+    pass `vocabulary` (e.g. a Graph) to collect all type definitions there instead
+    of the sink passed in by the builders
+    """
+
+    def __init__(self, vocabulary=None):
+        self.vocabulary = vocabulary
+        self._seen = set()
+        self._types = set()
+
+    def add(self, sink, type_uri: URIRef, label: Literal = None):
+        target = sink if self.vocabulary is None else self.vocabulary
+        self._types.add(type_uri)
+        triples = [(type_uri, RDF.type, E55_Type)]
+        if label is not None:
+            triples.append((type_uri, RDFS.label, label))
+        for triple in triples:
+            if triple not in self._seen:
+                self._seen.add(triple)
+                target.add(triple)
+
+    def types(self) -> set:
+        return set(self._types)
+
+    def to_graph(self) -> Graph:
+        g = Graph()
+        for triple in self._seen:
+            g.add(triple)
+        return g
+
+    def __contains__(self, type_uri: URIRef) -> bool:
+        return type_uri in self._types
+
+    def __len__(self) -> int:
+        return len(self._types)
@@ -0,0 +1,173 @@
+import sqlite3
+from functools import lru_cache
+
+from rdflib import BNode, Graph, Literal, URIRef
+from acdh_cidoc_pyutils.writers import NTriplesWriter
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS terms (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    value TEXT NOT NULL,
+    lang TEXT NOT NULL DEFAULT '',
+    datatype TEXT NOT NULL DEFAULT '',
+    UNIQUE (kind, value, lang, datatype)
+);
+CREATE TABLE IF NOT EXISTS triples (
+    s INTEGER NOT NULL,
+    p INTEGER NOT NULL,
+    o INTEGER NOT NULL,
+    PRIMARY KEY (s, p, o)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS triples_p ON triples (p, o);
+CREATE INDEX IF NOT EXISTS triples_o ON triples (o);
+"""
+
+_SELECT_TRIPLES = """
+SELECT s.kind, s.value, s.lang, s.datatype,
+       p.kind, p.value, p.lang, p.datatype,
+       o.kind, o.value, o.lang, o.datatype
+FROM triples t
+JOIN terms s ON s.id = t.s
+JOIN terms p ON p.id = t.p
+JOIN terms o ON o.id = t.o
+"""
+
+
+def _term_key(term) -> tuple:
+    if isinstance(term, URIRef):
+        return ("u", str(term), "", "")
+    if isinstance(term, Literal):
+        return ("l", str(term), term.language or "", str(term.datatype or ""))
+    if isinstance(term, BNode):
+        return ("b", str(term), "", "")
+    raise TypeError(f"can't store {term!r} as RDF term")
+
+
+def _key_term(kind: str, value: str, lang: str, datatype: str):
+    if kind == "u":
+        return URIRef(value)
+    if kind == "l":
+        return Literal(value, lang=lang or None, datatype=URIRef(datatype) if datatype else None)
+    return BNode(value)
+
+
+class SQLiteSink:
+    """sink which stores the triples in a SQLite file
+
+    terms are kept once in a `terms` table, `triples` holds their ids (primary
+    key subject/predicate/object, further indexes on predicate and object);
+    added triples are written with `executemany` in batches of `batch_size`,
+    each batch in its own transaction, so an interrupted run keeps everything
+    up to the last finished batch
+    """
+
+    def __init__(self, path: str, batch_size=10000, cache_size=100000):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(_SCHEMA)
+        self.batch_size = batch_size
+        # ids of recently used terms, others are looked up in the terms table
+        self._key_id = lru_cache(maxsize=cache_size)(self._lookup_id)
+        self._next_id = self.conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM terms").fetchone()[0]
+        self._new_ids = {}
+        self._new_terms = []
+        self._triples = []
+
+    def _lookup_id(self, key: tuple) -> int:
+        # terms of the current batch are not in the table yet
+        term_id = self._new_ids.get(key)
+        if term_id is not None:
+            return term_id
+        row = self.conn.execute(
+            "SELECT id FROM terms WHERE kind = ? AND value = ? AND lang = ? AND datatype = ?", key
+        ).fetchone()
+        if row is not None:
+            return row[0]
+        term_id = self._next_id
+        self._next_id += 1
+        self._new_ids[key] = term_id
+        self._new_terms.append((term_id,) + key)
+        return term_id
+
+    def _term_id(self, term) -> int:
+        return self._key_id(_term_key(term))
+
+    def add(self, triple):
+        s, p, o = triple[:3]
+        self._triples.append((self._term_id(s), self._term_id(p), self._term_id(o)))
+        if len(self._triples) >= self.batch_size:
+            self.flush()
+        return self
+
+    def flush(self):
+        if not self._triples and not self._new_terms:
+            return
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO terms (id, kind, value, lang, datatype) VALUES (?, ?, ?, ?, ?)",
+                self._new_terms,
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO triples (s, p, o) VALUES (?, ?, ?)", self._triples
+            )
+        self._new_ids = {}
+        self._new_terms = []
+        self._triples = []
+
+    def triples(self, pattern=(None, None, None)):
+        self.flush()
+        conditions = []
+        params = []
+        for column, term in zip("spo", pattern):
+            if term is None:
+                continue
+            conditions.append(
+                f"{column}.kind = ? AND {column}.value = ? AND {column}.lang = ? AND {column}.datatype = ?"
+            )
+            params.extend(_term_key(term))
+        query = _SELECT_TRIPLES
+        if conditions:
+            query = f"{query} WHERE {' AND '.join(conditions)}"
+        for row in self.conn.execute(query, params):
+            yield _key_term(*row[:4]), _key_term(*row[4:8]), _key_term(*row[8:])
+
+    def has_subject(self, subj) -> bool:
+        self.flush()
+        return self.conn.execute(
+            "SELECT 1 FROM triples JOIN terms ON terms.id = triples.s "
+            "WHERE terms.kind = ? AND terms.value = ? AND terms.lang = ? AND terms.datatype = ? LIMIT 1",
+            _term_key(subj),
+        ).fetchone() is not None
+
+    def export_ntriples(self, destination, compression=None) -> int:
+        with NTriplesWriter(destination, compression=compression) as writer:
+            writer.write(self.triples())
+        return writer.count
+
+    def to_graph(self, graph: Graph = None) -> Graph:
+        g = Graph() if graph is None else graph
+        for triple in self.triples():
+            g.add(triple)
+        return g
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def __iter__(self):
+        return self.triples()
+
+    def __contains__(self, triple) -> bool:
+        for _ in self.triples(triple):
+            return True
+        return False
+
+    def __len__(self) -> int:
+        self.flush()
+        return self.conn.execute("SELECT COUNT(*) FROM triples").fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,134 @@
+import json
+import time
+from functools import wraps
+
+from rdflib import Graph
+
+# the Stats object currently recording, None while instrumentation is disabled
+_active = None
+_running = []
+
+
+class FunctionStats:
+    __slots__ = ("calls", "seconds", "triples", "xpath_evaluations", "cache_hits", "cache_misses")
+
+    def __init__(self):
+        for key in self.__slots__:
+            setattr(self, key, 0)
+
+    def to_dict(self) -> dict:
+        return {key: getattr(self, key) for key in self.__slots__}
+
+
+class Stats:
+    """collects per function call counts, (inclusive) wall time, emitted triples,
+    XPath evaluations and cache hits/misses while it is enabled
+
+    use it as context manager or call `enable()`/`disable()`
+    """
+
+    def __init__(self):
+        self.functions = {}
+        self._previous = None
+
+    def get(self, name: str) -> FunctionStats:
+        try:
+            return self.functions[name]
+        except KeyError:
+            self.functions[name] = FunctionStats()
+            return self.functions[name]
+
+    def enable(self):
+        global _active
+        self._previous = _active
+        _active = self
+        return self
+
+    def disable(self):
+        global _active
+        _active = self._previous
+        self._previous = None
+
+    def reset(self):
+        self.functions = {}
+
+    def to_dict(self) -> dict:
+        return {name: value.to_dict() for name, value in sorted(self.functions.items())}
+
+    def dump_json(self, destination=None, indent=2) -> str:
+        data = json.dumps(self.to_dict(), indent=indent)
+        if isinstance(destination, str):
+            with open(destination, "w") as f:
+                f.write(data)
+        elif destination is not None:
+            destination.write(data)
+        return data
+
+    def __enter__(self):
+        return self.enable()
+
+    def __exit__(self, *args):
+        self.disable()
+
+
+def get_active_stats() -> Stats:
+    return _active
+
+
+def record_xpath(compiled: bool):
+    if _running:
+        current = _running[-1]
+        current.xpath_evaluations += 1
+        record_cache(not compiled)
+
+
+def record_cache(hit: bool):
+    if _running:
+        if hit:
+            _running[-1].cache_hits += 1
+        else:
+            _running[-1].cache_misses += 1
+
+
+class _CountingSink:
+    __slots__ = ("sink", "count")
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.count = 0
+
+    def add(self, triple):
+        self.count += 1
+        self.sink.add(triple)
+
+
+def instrumented(func):
+    name = func.__name__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        stats = _active
+        if stats is None:
+            return func(*args, **kwargs)
+        sink = kwargs.get("sink")
+        if sink is None:
+            sink = Graph()
+        counting_sink = _CountingSink(sink)
+        kwargs["sink"] = counting_sink
+        function_stats = stats.get(name)
+        _running.append(function_stats)
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            function_stats.seconds += time.perf_counter() - start
+            function_stats.calls += 1
+            function_stats.triples += counting_sink.count
+            _running.pop()
+        if result is counting_sink:
+            return sink
+        if isinstance(result, tuple) and result and result[0] is counting_sink:
+            return (sink,) + result[1:]
+        return result
+
+    return wrapper
@@ -0,0 +1,82 @@
+from typing import Callable, Iterator, Union
+
+import lxml.etree as ET
+from lxml.etree import Element
+from rdflib import Graph, URIRef
+from acdh_cidoc_pyutils.namespaces import NSMAP
+
+ENTITY_TAGS = ("person", "place", "org", "bibl")
+XML_ID = "{http://www.w3.org/XML/1998/namespace}id"
+
+
+def _release(node: Element):
+    node.clear(keep_tail=True)
+    for ancestor in node.iterancestors():
+        parent = ancestor.getparent()
+        if parent is None:
+            break
+        while ancestor.getprevious() is not None:
+            del parent[0]
+    parent = node.getparent()
+    if parent is not None:
+        while node.getprevious() is not None:
+            del parent[0]
+
+
+def iter_entities(
+    source,
+    tags=ENTITY_TAGS,
+    huge_tree=False,
+) -> Iterator[Element]:
+    qualified_tags = [f"{{{NSMAP['tei']}}}{tag}" for tag in tags]
+    context = ET.iterparse(
+        source, events=("start", "end"), tag=qualified_tags, huge_tree=huge_tree
+    )
+    depth = 0
+    for event, node in context:
+        if event == "start":
+            depth += 1
+            continue
+        depth -= 1
+        yield node
+        if depth == 0:
+            # nested entities are yielded (before their ancestor) but only
+            # released together with the top-level entity
+            _release(node)
+    del context
+
+
+def default_subject(node: Element, domain: str) -> Union[URIRef, None]:
+    xml_id = node.get(XML_ID)
+    if xml_id is None:
+        return None
+    return URIRef(f"{domain}{xml_id}")
+
+
+def convert_entity(node: Element, builders: dict, domain: str, sink, subject_factory: Callable = None):
+    if subject_factory:
+        subj = subject_factory(node)
+    else:
+        subj = default_subject(node, domain)
+    if subj is None:
+        return
+    for builder in builders[node.tag.split("}")[-1]]:
+        builder(subj, node, sink=sink)
+    # e.g. TurtleWriter writes the subject blocks of an entity once it is complete
+    end_entity = getattr(sink, "end_entity", None)
+    if end_entity is not None:
+        end_entity()
+
+
+def convert_stream(
+    source,
+    builders: dict,
+    domain: str,
+    sink=None,
+    subject_factory: Callable = None,
+    huge_tree=False,
+):
+    g = Graph() if sink is None else sink
+    for node in iter_entities(source, tags=tuple(builders), huge_tree=huge_tree):
+        convert_entity(node, builders, domain, g, subject_factory)
+    return g
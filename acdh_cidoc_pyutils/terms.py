@@ -0,0 +1,72 @@
+from rdflib import Literal, URIRef
+
+_term_pool = None
+# incremented whenever the pool changes, lets caches of interned terms tell their entries apart
+_generation = 0
+
+
+class TermPool:
+    """hands out one shared URIRef/Literal object per distinct value
+
+    once `maxsize` terms are pooled, new values are no longer added but created as usual
+    """
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._terms = {}
+
+    def _store(self, key, term):
+        self.misses += 1
+        if self.maxsize is None or len(self._terms) < self.maxsize:
+            self._terms[key] = term
+        return term
+
+    def uri(self, value: str) -> URIRef:
+        term = self._terms.get(value)
+        if term is None:
+            # str() drops lxml smart string references to their parent element
+            return self._store(str(value), URIRef(value))
+        self.hits += 1
+        return term
+
+    def literal(self, value: str, lang: str = None, datatype: URIRef = None) -> Literal:
+        key = (value, lang, datatype)
+        term = self._terms.get(key)
+        if term is None:
+            return self._store(
+                (str(value), lang, datatype), Literal(value, lang=lang, datatype=datatype)
+            )
+        self.hits += 1
+        return term
+
+    def clear(self):
+        self._terms.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+
+def set_term_pool(pool: TermPool = None):
+    global _term_pool, _generation
+    _term_pool = pool
+    _generation += 1
+
+
+def get_term_pool() -> TermPool:
+    return _term_pool
+
+
+def intern_uri(value: str) -> URIRef:
+    if _term_pool is None:
+        return URIRef(value)
+    return _term_pool.uri(value)
+
+
+def intern_literal(value: str, lang: str = None, datatype: URIRef = None) -> Literal:
+    if _term_pool is None:
+        return Literal(value, lang=lang, datatype=datatype)
+    return _term_pool.literal(value, lang=lang, datatype=datatype)
@@ -0,0 +1,234 @@
+import gzip
+import lzma
+import os
+import re
+from functools import lru_cache
+
+from rdflib import OWL, RDF, RDFS, XSD, BNode, Literal, URIRef
+from rdflib.plugins.parsers.ntriples import W3CNTriplesParser
+from acdh_cidoc_pyutils.namespaces import CIDOC, FRBROO
+
+COMPRESSION_SUFFIXES = {".gz": "gzip", ".xz": "lzma", ".lzma": "lzma"}
+
+_IRI_ESCAPES = {c: f"\\u{c:04X}" for c in range(0x21)}
+_IRI_ESCAPES.update({ord(c): f"\\u{ord(c):04X}" for c in '<>"{}|^`\\'})
+_LITERAL_ESCAPES = {
+    ord("\\"): "\\\\",
+    ord('"'): '\\"',
+    ord("\n"): "\\n",
+    ord("\r"): "\\r",
+}
+DEFAULT_PREFIXES = {"cidoc": CIDOC, "frbroo": FRBROO, "owl": OWL, "rdf": RDF, "rdfs": RDFS, "xsd": XSD}
+# local names which can be written as prefix:name without escaping
+_LOCAL_NAME = re.compile(r"[A-Za-z0-9_](?:[A-Za-z0-9_.\-]*[A-Za-z0-9_\-])?$")
+
+
+def open_output(destination, compression=None):
+    if isinstance(destination, (str, os.PathLike)):
+        if compression is None:
+            compression = COMPRESSION_SUFFIXES.get(os.path.splitext(destination)[1])
+        if compression == "gzip":
+            return gzip.open(destination, "wb"), True
+        if compression == "lzma":
+            return lzma.open(destination, "wb"), True
+        if compression is None:
+            return open(destination, "wb"), True
+    else:
+        if compression == "gzip":
+            return gzip.GzipFile(fileobj=destination, mode="wb"), True
+        if compression == "lzma":
+            return lzma.LZMAFile(destination, "wb"), True
+        if compression is None:
+            return destination, False
+    raise ValueError(f"unknown compression: {compression}")
+
+
+@lru_cache(maxsize=65536)
+def _iri_to_nt(iri: str) -> str:
+    return f"<{iri.translate(_IRI_ESCAPES)}>"
+
+
+def term_to_nt(term) -> str:
+    if isinstance(term, URIRef):
+        return _iri_to_nt(term)
+    if isinstance(term, Literal):
+        value = f'"{str(term).translate(_LITERAL_ESCAPES)}"'
+        if term.language:
+            return f"{value}@{term.language}"
+        if term.datatype:
+            return f"{value}^^{_iri_to_nt(term.datatype)}"
+        return value
+    if isinstance(term, BNode):
+        return f"_:{term}"
+    raise TypeError(f"can't serialize {term!r} as N-Triples term")
+
+
+def triple_to_nt(triple) -> str:
+    s, p, o = triple[:3]
+    return f"{term_to_nt(s)} {term_to_nt(p)} {term_to_nt(o)} .\n"
+
+
+class _ParserSink:
+    def __init__(self, sink):
+        self.sink = sink
+
+    def triple(self, s, p, o):
+        self.sink.add((s, p, o))
+
+
+def parse_ntriples(data: str, sink):
+    W3CNTriplesParser(sink=_ParserSink(sink)).parsestring(data)
+    return sink
+
+
+def parse_ntriples_file(f, sink):
+    """like parse_ntriples, but reads the (binary) file object `f` line by line"""
+    W3CNTriplesParser(sink=_ParserSink(sink)).parse(f)
+    return sink
+
+
+class NTriplesWriter:
+    """sink which writes every added triple as N-Triples line to a file or binary stream"""
+
+    def __init__(self, destination, compression=None, buffer_size=4096):
+        self.stream, self._close_stream = open_output(destination, compression)
+        self.buffer_size = buffer_size
+        self.count = 0
+        self._buffer = []
+
+    def _line(self, triple) -> str:
+        return triple_to_nt(triple)
+
+    def add(self, triple):
+        self._buffer.append(self._line(triple))
+        self.count += 1
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def write(self, triples):
+        for triple in triples:
+            self.add(triple)
+        return self
+
+    def __iadd__(self, triples):
+        return self.write(triples)
+
+    def write_ntriples(self, data: str):
+        """adds already serialized N-Triples lines"""
+        self.flush()
+        self.stream.write(data.encode("utf-8"))
+        self.count += data.count("\n")
+
+    def flush(self):
+        if self._buffer:
+            self.stream.write("".join(self._buffer).encode("utf-8"))
+            self._buffer = []
+
+    def close(self):
+        self.flush()
+        if self._close_stream:
+            self.stream.close()
+        else:
+            self.stream.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class NQuadsWriter(NTriplesWriter):
+    """like NTriplesWriter, adds `graph` (or the fourth element of a quad) as graph label"""
+
+    def __init__(self, destination, graph: URIRef = None, compression=None, buffer_size=4096):
+        super().__init__(destination, compression=compression, buffer_size=buffer_size)
+        self.graph = graph
+
+    def write_ntriples(self, data: str):
+        parse_ntriples(data, self)
+
+    def _line(self, triple) -> str:
+        s, p, o = triple[:3]
+        graph = triple[3] if len(triple) > 3 else self.graph
+        graph = getattr(graph, "identifier", graph)
+        if graph is None:
+            return f"{term_to_nt(s)} {term_to_nt(p)} {term_to_nt(o)} .\n"
+        return f"{term_to_nt(s)} {term_to_nt(p)} {term_to_nt(o)} {term_to_nt(graph)} .\n"
+
+
+class TurtleWriter(NTriplesWriter):
+    """sink which writes Turtle: the prefix declarations up front, then one block
+    per subject (`;` between predicates, `,` between objects)
+
+    the triples of an entity are buffered until `end_entity` (called by
+    `convert_entity`/`convert_stream` after each entity) or until `buffer_size`
+    triples are buffered, so memory is bounded by the size of one entity. A subject
+    whose triples are spread over several entities gets several blocks, which is
+    still valid Turtle. IRIs are abbreviated with `prefixes` (prefix -> namespace
+    ending with '/' or '#')
+    """
+
+    def __init__(self, destination, prefixes: dict = None, compression=None, buffer_size=100000):
+        super().__init__(destination, compression=compression, buffer_size=buffer_size)
+        prefixes = DEFAULT_PREFIXES if prefixes is None else prefixes
+        self.prefixes = {prefix: f"{ns}" for prefix, ns in prefixes.items()}
+        self._namespaces = {ns: prefix for prefix, ns in self.prefixes.items()}
+        self._iri = lru_cache(maxsize=65536)(self._iri_to_ttl)
+        self._subjects = {}
+        self._buffered = 0
+        if self.prefixes:
+            self.stream.write("".join(
+                f"@prefix {prefix}: {_iri_to_nt(ns)} .\n" for prefix, ns in self.prefixes.items()
+            ).encode("utf-8") + b"\n")
+
+    def _iri_to_ttl(self, iri: str) -> str:
+        split = max(iri.rfind("/"), iri.rfind("#")) + 1
+        prefix = self._namespaces.get(iri[:split])
+        if prefix is not None and (split == len(iri) or _LOCAL_NAME.match(iri, split)):
+            return f"{prefix}:{iri[split:]}"
+        return _iri_to_nt(iri)
+
+    def _term(self, term) -> str:
+        if isinstance(term, URIRef):
+            return self._iri(term)
+        if isinstance(term, Literal) and term.datatype and not term.language:
+            return f'"{str(term).translate(_LITERAL_ESCAPES)}"^^{self._iri(term.datatype)}'
+        return term_to_nt(term)
+
+    def add(self, triple):
+        s, p, o = triple[:3]
+        try:
+            predicates = self._subjects[s]
+        except KeyError:
+            predicates = self._subjects[s] = {}
+        try:
+            predicates[p][o] = None
+        except KeyError:
+            predicates[p] = {o: None}
+        self.count += 1
+        self._buffered += 1
+        if self._buffered >= self.buffer_size:
+            self.flush()
+
+    def write_ntriples(self, data: str):
+        parse_ntriples(data, self)
+
+    def _block(self, subj, predicates: dict) -> str:
+        lines = []
+        if RDF.type in predicates:
+            predicates = {RDF.type: predicates.pop(RDF.type), **predicates}
+        for p, objects in predicates.items():
+            p = "a" if p == RDF.type else self._iri(p)
+            lines.append(f"{p} " + ",\n        ".join(self._term(o) for o in objects))
+        return f"{self._term(subj)} " + " ;\n    ".join(lines) + " .\n\n"
+
+    def flush(self):
+        if self._subjects:
+            data = "".join(self._block(s, predicates) for s, predicates in self._subjects.items())
+            self.stream.write(data.encode("utf-8"))
+            self._subjects = {}
+            self._buffered = 0
+
+    def end_entity(self):
+        self.flush()
@@ -0,0 +1,39 @@
+from functools import lru_cache
+
+from lxml.etree import XPath
+from acdh_cidoc_pyutils import stats
+from acdh_cidoc_pyutils.namespaces import NSMAP
+
+XPATH_CACHE_SIZE = 1024
+
+_NSMAP_KEY = tuple(sorted(NSMAP.items()))
+
+
+@lru_cache(maxsize=XPATH_CACHE_SIZE)
+def _compile_xpath(expression: str, namespaces: tuple) -> XPath:
+    return XPath(expression, namespaces=dict(namespaces))
+
+
+def get_xpath(expression: str, namespaces=NSMAP) -> XPath:
+    if namespaces is NSMAP:
+        key = _NSMAP_KEY
+    else:
+        key = tuple(sorted(namespaces.items())) if namespaces else ()
+    return _compile_xpath(expression, key)
+
+
+def xpath(node, expression: str, namespaces=NSMAP) -> list:
+    if stats._active is None:
+        return get_xpath(expression, namespaces)(node)
+    misses = _compile_xpath.cache_info().misses
+    compiled = get_xpath(expression, namespaces)
+    stats.record_xpath(compiled=_compile_xpath.cache_info().misses != misses)
+    return compiled(node)
+
+
+def xpath_cache_info():
+    return _compile_xpath.cache_info()
+
+
+def xpath_cache_clear():
+    _compile_xpath.cache_clear()
@@ -0,0 +1 @@
+"""Benchmarks for `acdh_cidoc_pyutils` (not part of the distributed package)."""
@@ -0,0 +1,129 @@
+import random
+from xml.sax.saxutils import escape
+
+FORENAMES = ["Olaf", "Anna", "Karl", "Berta", "Franz", "Marie", "Josef", "Hedwig", "Leopold", "Rosa"]
+SURNAMES = ["Gulbransson", "Kraus", "Schnitzler", "Bahr", "Altenberg", "Loos", "Wittgenstein", "Zuckerkandl"]
+PLACE_NAMES = ["Wien", "Graz", "Linz", "Prag", "Berlin", "München", "Reval", "Triest", "Salzburg", "Brünn"]
+ORG_NAMES = ["Verein", "Gymnasium", "Akademie", "Partei", "Redaktion", "Theater", "Bund", "Gesellschaft"]
+OCCUPATIONS = ["Maler", "Schriftstellerin", "Zeichner", "Journalist", "Schauspielerin", "Architekt"]
+NAME_TYPES = ["pref", "orig_name", "alt_label", "full", "short", "simple_name"]
+EVENT_TYPES = ["travel", "move", "lecture", "exhibition"]
+LANGS = ["de", "en", "fr", "it", "und"]
+
+
+def _date(rng: random.Random) -> str:
+    year = rng.randint(1700, 1999)
+    kind = rng.random()
+    if kind < 0.4:
+        return f"{year}"
+    if kind < 0.6:
+        return f"{year}-{rng.randint(1, 12):02d}"
+    return f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+
+
+def _date_attributes(rng: random.Random) -> str:
+    kind = rng.random()
+    if kind < 0.3:
+        return f' when="{_date(rng)}"'
+    if kind < 0.6:
+        return f' notBefore="{_date(rng)}" notAfter="{_date(rng)}"'
+    if kind < 0.8:
+        return f' from-iso="{_date(rng)}"'
+    return ""
+
+
+def _person(rng: random.Random, i: int, n_places: int, n_orgs: int) -> str:
+    forename, surname = rng.choice(FORENAMES), rng.choice(SURNAMES)
+    parts = [f'<person xml:id="person{i:07d}">']
+    parts.append(
+        f'<persName xml:lang="{rng.choice(LANGS)}"><forename>{forename}</forename>'
+        f"<surname>{surname}</surname></persName>"
+    )
+    for _ in range(rng.randint(0, 3)):
+        parts.append(
+            f'<persName type="{rng.choice(NAME_TYPES)}">{surname}, {forename}</persName>'
+        )
+    if n_places:
+        parts.append(
+            f'<birth when="{_date(rng)}">{_date(rng)}'
+            f'<placeName key="#place{rng.randrange(n_places):07d}">{rng.choice(PLACE_NAMES)}</placeName></birth>'
+        )
+        parts.append(
+            f'<death><date{_date_attributes(rng)}>{_date(rng)}</date>'
+            f'<settlement key="place{rng.randrange(n_places):07d}">'
+            f"<placeName>{rng.choice(PLACE_NAMES)}</placeName></settlement></death>"
+        )
+    for j in range(rng.randint(0, 3)):
+        parts.append(
+            f'<occupation{_date_attributes(rng)} key="#occ{j}" xml:lang="{rng.choice(LANGS)}">'
+            f"{rng.choice(OCCUPATIONS)}</occupation>"
+        )
+    for _ in range(rng.randint(0, 3) if n_orgs else 0):
+        parts.append(
+            f'<affiliation{_date_attributes(rng)} ref="#org{rng.randrange(n_orgs):07d}">'
+            f"{rng.choice(ORG_NAMES)}</affiliation>"
+        )
+    for _ in range(rng.randint(0, 2) if n_places else 0):
+        parts.append(
+            f'<event type="{rng.choice(EVENT_TYPES)}"><desc><date when="{_date(rng)}"/>'
+            f'<placeName key="#place{rng.randrange(n_places):07d}">{rng.choice(PLACE_NAMES)}</placeName>'
+            f"</desc><note>{escape(rng.choice(OCCUPATIONS))} in {rng.choice(PLACE_NAMES)}</note></event>"
+        )
+    parts.append(f'<idno type="gnd">https://d-nb.info/gnd/{rng.randint(10000, 99999999)}</idno>')
+    if rng.random() < 0.5:
+        parts.append(f'<idno type="URI" subtype="pmb">https://pmb.acdh.oeaw.ac.at/entity/{i}/</idno>')
+    parts.append("</person>")
+    return "".join(parts)
+
+
+def _place(rng: random.Random, i: int) -> str:
+    name = rng.choice(PLACE_NAMES)
+    parts = [f'<place xml:id="place{i:07d}">']
+    parts.append(f'<placeName type="orig_name">{name}</placeName>')
+    for _ in range(rng.randint(0, 2)):
+        parts.append(
+            f'<placeName xml:lang="{rng.choice(LANGS)}" type="{rng.choice(NAME_TYPES)}">{name}</placeName>'
+        )
+    parts.append(f'<idno type="URI" subtype="geonames">https://www.geonames.org/{rng.randint(1, 9999999)}</idno>')
+    parts.append(
+        f"<location><geo>{rng.uniform(-90, 90):.5f} {rng.uniform(-180, 180):.5f}</geo></location>"
+    )
+    parts.append("</place>")
+    return "".join(parts)
+
+
+def _org(rng: random.Random, i: int) -> str:
+    name = f"{rng.choice(ORG_NAMES)} {rng.choice(PLACE_NAMES)}"
+    parts = [f'<org xml:id="org{i:07d}">']
+    parts.append(f'<orgName xml:lang="de" type="full">{name}</orgName>')
+    if rng.random() < 0.5:
+        parts.append(f'<orgName xml:lang="de" type="short">{name.split()[0]}</orgName>')
+    parts.append(f'<idno type="pmb">https://pmb.acdh.oeaw.ac.at/entity/{rng.randint(1, 999999)}/</idno>')
+    parts.append("</org>")
+    return "".join(parts)
+
+
+def iter_corpus(n_persons=1000, n_places=500, n_orgs=200, seed=42):
+    rng = random.Random(seed)
+    yield '<TEI xmlns="http://www.tei-c.org/ns/1.0"><teiHeader/><text><body>'
+    yield "<listPerson>"
+    for i in range(n_persons):
+        yield _person(rng, i, n_places, n_orgs)
+    yield "</listPerson><listPlace>"
+    for i in range(n_places):
+        yield _place(rng, i)
+    yield "</listPlace><listOrg>"
+    for i in range(n_orgs):
+        yield _org(rng, i)
+    yield "</listOrg></body></text></TEI>"
+
+
+def generate_corpus(n_persons=1000, n_places=500, n_orgs=200, seed=42) -> str:
+    return "".join(iter_corpus(n_persons, n_places, n_orgs, seed))
+
+
+def write_corpus(path: str, n_persons=1000, n_places=500, n_orgs=200, seed=42) -> str:
+    with open(path, "w", encoding="utf-8") as f:
+        for chunk in iter_corpus(n_persons, n_places, n_orgs, seed):
+            f.write(chunk)
+    return path
@@ -0,0 +1,183 @@
+import argparse
+import json
+import platform
+import sys
+import time
+from functools import partial
+from io import BytesIO
+
+import lxml.etree as ET
+from acdh_tei_pyutils.utils import make_entity_label
+from acdh_cidoc_pyutils import (
+    coordinates_to_p168,
+    make_affiliations,
+    make_appellations,
+    make_birth_death_entities,
+    make_e42_identifiers,
+    make_events,
+    make_occupations,
+)
+from acdh_cidoc_pyutils.incremental import LIBRARY_VERSION
+from acdh_cidoc_pyutils.namespaces import NSMAP
+from acdh_cidoc_pyutils.stream import convert_stream, default_subject
+from benchmarks.corpus import generate_corpus
+
+DOMAIN = "https://bench.example.org/"
+TYPE_DOMAIN = "https://bench.example.org/types/"
+
+
+class CountingSink:
+    def __init__(self):
+        self.count = 0
+
+    def add(self, triple):
+        self.count += 1
+
+
+def _affiliations(subj, node, sink=None):
+    name_node = node.xpath(".//tei:persName[1]", namespaces=NSMAP)[0]
+    person_label, _ = make_entity_label(name_node)
+    return make_affiliations(subj, node, DOMAIN, person_label, sink=sink)
+
+
+def _birth_death(subj, node, sink=None):
+    make_birth_death_entities(subj, node, DOMAIN, sink=sink)
+    make_birth_death_entities(
+        subj, node, DOMAIN, event_type="death", date_node_xpath="/tei:date[1]",
+        place_id_xpath="//tei:settlement[1]/@key", sink=sink
+    )
+    return sink
+
+
+BUILDERS = {
+    "make_appellations": (
+        ("person", "place", "org"), partial(make_appellations, type_domain=TYPE_DOMAIN)
+    ),
+    "make_e42_identifiers": (
+        ("person", "place", "org"), partial(make_e42_identifiers, type_domain=TYPE_DOMAIN)
+    ),
+    "make_occupations": (("person",), make_occupations),
+    "make_affiliations": (("person",), _affiliations),
+    "make_birth_death_entities": (("person",), _birth_death),
+    "make_events": (("person",), partial(make_events, type_domain=TYPE_DOMAIN, domain=DOMAIN)),
+    "coordinates_to_p168": (("place",), coordinates_to_p168),
+}
+
+
+def builders_by_tag() -> dict:
+    result = {}
+    for tags, builder in BUILDERS.values():
+        for tag in tags:
+            result.setdefault(tag, []).append(builder)
+    return result
+
+
+def _rates(entities: int, triples: int, seconds: float) -> dict:
+    return {
+        "entities": entities,
+        "triples": triples,
+        "seconds": round(seconds, 6),
+        "entities_per_sec": round(entities / seconds, 2) if seconds else None,
+        "triples_per_sec": round(triples / seconds, 2) if seconds else None,
+    }
+
+
+def bench_builders(data: bytes, repeat=3) -> dict:
+    doc = ET.fromstring(data)
+    results = {}
+    for name, (tags, builder) in BUILDERS.items():
+        expression = "|".join(f".//tei:{tag}" for tag in tags)
+        nodes = [(default_subject(x, DOMAIN), x) for x in doc.xpath(expression, namespaces=NSMAP)]
+        best = None
+        for _ in range(repeat):
+            sink = CountingSink()
+            start = time.perf_counter()
+            for subj, node in nodes:
+                builder(subj, node, sink=sink)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = _rates(len(nodes), sink.count, best)
+    return results
+
+
+def bench_end_to_end(data: bytes, repeat=3) -> dict:
+    builders = builders_by_tag()
+    best = None
+    for _ in range(repeat):
+        sink = CountingSink()
+        start = time.perf_counter()
+        convert_stream(BytesIO(data), builders, DOMAIN, sink=sink)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    entities = len(ET.fromstring(data).xpath(
+        ".//tei:person|.//tei:place|.//tei:org", namespaces=NSMAP
+    ))
+    return _rates(entities, sink.count, best)
+
+
+def run(n_persons=1000, n_places=500, n_orgs=200, seed=42, repeat=3) -> dict:
+    data = generate_corpus(n_persons, n_places, n_orgs, seed).encode("utf-8")
+    return {
+        "meta": {
+            "library_version": LIBRARY_VERSION,
+            "python": platform.python_version(),
+            "persons": n_persons,
+            "places": n_places,
+            "orgs": n_orgs,
+            "seed": seed,
+            "repeat": repeat,
+            "bytes": len(data),
+        },
+        "builders": bench_builders(data, repeat),
+        "end_to_end": bench_end_to_end(data, repeat),
+    }
+
+
+def compare(current: dict, baseline: dict) -> dict:
+    """entities/sec of `current` relative to `baseline` (> 1 means faster)"""
+    ratios = {}
+    pairs = [(f"builders.{x}", current["builders"][x], baseline["builders"].get(x))
+             for x in current["builders"]]
+    pairs.append(("end_to_end", current["end_to_end"], baseline.get("end_to_end")))
+    for name, new, old in pairs:
+        if old and old.get("entities_per_sec") and new.get("entities_per_sec"):
+            ratios[name] = round(new["entities_per_sec"] / old["entities_per_sec"], 3)
+    return ratios
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="benchmark the acdh_cidoc_pyutils builders")
+    parser.add_argument("--persons", type=int, default=1000)
+    parser.add_argument("--places", type=int, default=500)
+    parser.add_argument("--orgs", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument(
+        "--threshold", type=float, default=0.9,
+        help="exit with 1 if a ratio against the baseline is below this value",
+    )
+    args = parser.parse_args(argv)
+    results = run(args.persons, args.places, args.orgs, args.seed, args.repeat)
+    for name, values in list(results["builders"].items()) + [("end to end", results["end_to_end"])]:
+        print(
+            f"{name:<28} {values['entities_per_sec']:>12} entities/s {values['triples_per_sec']:>12} triples/s"
+        )
+    ratios = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            ratios = compare(results, json.load(f))
+        results["comparison"] = ratios
+        for name, ratio in ratios.items():
+            print(f"{name:<38} {ratio:>6}x")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if any(ratio < args.threshold for ratio in ratios.values()):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
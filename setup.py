@@ -24,8 +24,17 @@ setup(
         "License :: OSI Approved :: MIT License",
         "Natural Language :: English",
     ],
+    entry_points={
+        "console_scripts": [
+            "cidoc-pyutils=acdh_cidoc_pyutils.cli:main",
+        ],
+    },
     description="Helper functions for the generation of CIDOC CRMish RDF (from XML/TEI data)",
     install_requires=requirements,
+    extras_require={
+        "numpy": ["numpy"],
+        "toml": ["tomli; python_version < '3.11'"],
+    },
     license="MIT license",
     long_description=readme,
     long_description_content_type="text/markdown",
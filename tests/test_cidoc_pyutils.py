@@ -1,12 +1,29 @@
+import asyncio
+import gzip
+import json
+import lzma
+import os
+import pickle
+import re
+import subprocess
+import sys
+import tempfile
 import unittest
+import uuid
+from unittest import mock
+from functools import partial
+from io import BytesIO
+
 import lxml.etree as ET
 
 from lxml.etree import Element
-from rdflib import Graph, URIRef, RDF
+from rdflib import ConjunctiveGraph, Graph, Literal, URIRef, RDF, RDFS, XSD
 
 from acdh_cidoc_pyutils import (
     date_to_literal,
     make_uri,
+    make_uris,
+    UriMinter,
     create_e52,
     normalize_string,
     extract_begin_end,
@@ -16,8 +33,36 @@ from acdh_cidoc_pyutils import (
     make_birth_death_entities,
     make_occupations,
     make_affiliations,
+    date_literal_cache_info,
+    date_literal_cache_clear,
+    index_entity,
+    slugify,
+    appellation_type,
+    appellation_type_cache_info,
+    appellation_type_cache_clear,
+    make_entity,
+    make_events,
+    _date_to_literal,
 )
-from acdh_cidoc_pyutils.namespaces import NSMAP, CIDOC
+from acdh_cidoc_pyutils.namespaces import NSMAP, CIDOC, E55_Type, P2_has_type
+from acdh_cidoc_pyutils.xpath import get_xpath, xpath, xpath_cache_info
+from acdh_cidoc_pyutils.stream import iter_entities, convert_stream
+from acdh_cidoc_pyutils.writers import NTriplesWriter, NQuadsWriter, TurtleWriter, term_to_nt
+from acdh_cidoc_pyutils.parallel import convert_parallel
+from acdh_cidoc_pyutils.registry import TypeRegistry
+from acdh_cidoc_pyutils.terms import TermPool, set_term_pool
+from acdh_cidoc_pyutils.incremental import EntityCache, convert_incremental
+from acdh_cidoc_pyutils.aio import aiter_files, convert_files
+from acdh_cidoc_pyutils.extsort import sort_unique
+from acdh_cidoc_pyutils.sqlite_store import SQLiteSink
+from acdh_cidoc_pyutils.cli import main as cli_main, parse_size
+from acdh_cidoc_pyutils.mapping import compile_mapping
+from acdh_cidoc_pyutils.geo import coordinates_to_p168_bulk, STATUS_OK, STATUS_SWAPPED
+from acdh_cidoc_pyutils.indexes import LabelIndex, ReferenceIndex, build_org_index, build_reference_index
+from acdh_cidoc_pyutils.compact import CompactTripleBuffer, TermDictionary, pack_ids, unpack_ids
+from acdh_cidoc_pyutils.stats import Stats, get_active_stats
+from benchmarks.corpus import generate_corpus
+from benchmarks.run import run as run_benchmark, compare as compare_benchmarks, main as benchmark_main
 
 sample = """
 <TEI xmlns="http://www.tei-c.org/ns/1.0">
@@ -104,6 +149,9 @@ DATE_TYPES = [
     "None",
 ]
 
+# upper bound for `import acdh_cidoc_pyutils` (cumulative, as reported by -X importtime)
+IMPORT_TIME_BUDGET_MS = float(os.environ.get("ACDH_CIDOC_IMPORT_TIME_BUDGET_MS", 500))
+
 
 class TestTestTest(unittest.TestCase):
     """Tests for `acdh_cidoc_pyutils` package."""
@@ -147,6 +195,9 @@ class TestTestTest(unittest.TestCase):
         e52.serialize('e52.ttl')
         self.assertFalse('rdfs:label "1234-05-06"^^xsd:string' in f"{e52.serialize()}")
         e52.serialize('e521.ttl')
+        self.assertTrue((uri, RDFS.label, Literal("1222 - 1234-05-06", datatype=XSD.string)) in e52)
+        e52 = create_e52(uri, begin_of_begin="1900 - 1910", end_of_end="1920")
+        self.assertTrue((uri, RDFS.label, Literal("1900 - 1910 - 1920", datatype=XSD.string)) in e52)
 
     def test_005_normalize_string(self):
         string = """\n\nhallo
@@ -477,3 +528,898 @@ mein schatz ich liebe    dich
             org_label_xpath="./tei:orgName[1]//text()"
         )
         g.serialize("affiliations1.ttl")
+
+    def test_013_sink(self):
+        class ListSink:
+            def __init__(self):
+                self.triples = []
+
+            def add(self, triple):
+                self.triples.append(triple)
+
+        doc = ET.fromstring(sample)
+        g = Graph()
+        shared = Graph()
+        list_sink = ListSink()
+        for x in doc.xpath(".//tei:place|.//tei:org|.//tei:person", namespaces=NSMAP):
+            xml_id = x.attrib["{http://www.w3.org/XML/1998/namespace}id"].lower()
+            subj = URIRef(f"https://foo/bar/{xml_id}")
+            g += make_appellations(subj, x, type_domain="https://foo/types")
+            g += make_e42_identifiers(subj, x, type_domain="https://foo/types")
+            g += coordinates_to_p168(subj, x)
+            g += make_occupations(subj, x)[0]
+            for target in [shared, list_sink]:
+                result = make_appellations(subj, x, type_domain="https://foo/types", sink=target)
+                self.assertTrue(result is target)
+                make_e42_identifiers(subj, x, type_domain="https://foo/types", sink=target)
+                coordinates_to_p168(subj, x, sink=target)
+                result, uris = make_occupations(subj, x, sink=target)
+                self.assertTrue(result is target)
+        self.assertEqual(set(g), set(shared))
+        self.assertEqual(set(g), set(list_sink.triples))
+        x = doc.xpath(".//tei:person[1]", namespaces=NSMAP)[0]
+        subj = URIRef("https://foo/bar/dwpers0091")
+        event_graph, birth_uri, birth_timestamp = make_birth_death_entities(
+            subj, x, domain="https://foo/bar/", sink=shared
+        )
+        self.assertTrue(event_graph is shared)
+        self.assertTrue((birth_uri, CIDOC["P4_has_time-span"], birth_timestamp) in shared)
+
+    def test_014_xpath_cache(self):
+        doc = ET.fromstring(sample)
+        expression = ".//tei:place/tei:placeName[@type]"
+        compiled = get_xpath(expression)
+        self.assertTrue(compiled is get_xpath(expression))
+        self.assertTrue(compiled is get_xpath(expression, dict(NSMAP)))
+        self.assertFalse(compiled is get_xpath(expression, {"tei": "http://foo.bar"}))
+        hits = xpath_cache_info().hits
+        self.assertEqual(
+            xpath(doc, expression), doc.xpath(expression, namespaces=NSMAP)
+        )
+        self.assertEqual(xpath_cache_info().hits, hits + 1)
+        self.assertEqual(xpath(doc, "count(.//tei:idno)"), 10.0)
+
+    def test_015_stream(self):
+        tags = [x.split("}")[-1] for x in [
+            y.tag for y in iter_entities(BytesIO(sample.encode("utf-8")))
+        ]]
+        self.assertEqual(tags.count("person"), 4)
+        self.assertEqual(tags.count("place"), 3)
+        self.assertEqual(tags.count("bibl"), 1)
+        seen = []
+        for x in iter_entities(BytesIO(sample.encode("utf-8")), tags=["place"]):
+            self.assertTrue(len(x) > 0)
+            seen.append(x)
+        for x in seen:
+            self.assertEqual(len(x), 0)
+        for x in seen[:-1]:
+            self.assertTrue(x.getparent() is None)
+        builders = {
+            "place": [
+                partial(make_appellations, type_domain="https://foo/types"),
+                partial(make_e42_identifiers, type_domain="https://foo/types"),
+                coordinates_to_p168,
+            ],
+            "org": [partial(make_appellations, type_domain="https://foo/types")],
+        }
+        g = convert_stream(BytesIO(sample.encode("utf-8")), builders, "https://foo/bar/")
+        expected = Graph()
+        doc = ET.fromstring(sample)
+        for x in doc.xpath(".//tei:place|.//tei:org", namespaces=NSMAP):
+            xml_id = x.attrib["{http://www.w3.org/XML/1998/namespace}id"]
+            subj = URIRef(f"https://foo/bar/{xml_id}")
+            for builder in builders[x.tag.split("}")[-1]]:
+                builder(subj, x, sink=expected)
+        self.assertEqual(set(g), set(expected))
+
+    def test_016_ntriples_writer(self):
+        builders = {
+            "place": [coordinates_to_p168, make_e42_identifiers],
+            "person": [partial(make_appellations, default_lang="en")],
+        }
+        g = convert_stream(BytesIO(sample.encode("utf-8")), builders, "https://foo/bar/")
+        tricky = URIRef("https://foo/bar/tricky")
+        g.add((tricky, RDFS.label, Literal('line "one"\nline \\two', lang="de-AT")))
+        g.add((tricky, RDFS.comment, Literal("ümlaut")))
+        g.add((tricky, RDFS.seeAlso, URIRef("https://foo/bar/with space")))
+        self.assertEqual(
+            term_to_nt(Literal("Point(456 123)", datatype="geo:wktLiteral")),
+            '"Point(456 123)"^^<geo:wktLiteral>',
+        )
+        self.assertEqual(
+            term_to_nt(URIRef("https://foo/bar/with space")),
+            "<https://foo/bar/with\\u0020space>",
+        )
+        for compression, opener in [(None, None), ("gzip", gzip.decompress), ("lzma", lzma.decompress)]:
+            stream = BytesIO()
+            with NTriplesWriter(stream, compression=compression) as writer:
+                writer += g
+            self.assertEqual(writer.count, len(g))
+            data = stream.getvalue()
+            if opener:
+                data = opener(data)
+            parsed = Graph().parse(data=data.decode("utf-8"), format="nt")
+            self.assertEqual(set(parsed), set(g))
+        stream = BytesIO()
+        graph_name = URIRef("https://foo/bar/graph")
+        with NQuadsWriter(stream, graph=graph_name) as writer:
+            writer += g
+        parsed = ConjunctiveGraph()
+        parsed.parse(data=stream.getvalue().decode("utf-8"), format="nquads")
+        self.assertEqual(len(parsed.get_context(graph_name)), len(g))
+
+    def test_017_parallel(self):
+        builders = {
+            "place": [partial(make_appellations, type_domain="https://foo/types"), coordinates_to_p168],
+            "org": [partial(make_e42_identifiers, type_domain="https://foo/types")],
+            "person": [partial(make_occupations, prefix="job")],
+        }
+        expected = convert_stream(BytesIO(sample.encode("utf-8")), builders, "https://foo/bar/")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            sources = []
+            for i in range(2):
+                source = os.path.join(tmp_dir, f"sample{i}.xml")
+                with open(source, "w") as f:
+                    f.write(sample)
+                sources.append(source)
+            manifest = convert_parallel(
+                sources, builders, "https://foo/bar/", os.path.join(tmp_dir, "out"),
+                max_workers=2, entities_per_shard=3,
+            )
+            self.assertEqual([x["source"] for x in manifest], [sources[0]] * 3 + [sources[1]] * 3)
+            self.assertEqual([x["start"] for x in manifest], [0, 3, 6] * 2)
+            self.assertEqual([x["stop"] for x in manifest], [3, 6, 9] * 2)
+            self.assertEqual(sum(x["entities"] for x in manifest), 18)
+            g = Graph()
+            for shard in manifest[:3]:
+                with gzip.open(shard["shard"]) as f:
+                    g.parse(data=f.read().decode("utf-8"), format="nt")
+            self.assertEqual(set(g), set(expected))
+            deep = os.path.join(tmp_dir, "deep.xml")
+            with open(deep, "w") as f:
+                f.write(sample.replace("<idno subtype=", "<note>" * 300 + "</note>" * 300 + "<idno subtype="))
+            for entities_per_shard in (None, 2):
+                manifest = convert_parallel(
+                    [deep], builders, "https://foo/bar/", os.path.join(tmp_dir, "deep"),
+                    max_workers=2, entities_per_shard=entities_per_shard, huge_tree=True,
+                )
+                self.assertEqual(sum(x["entities"] for x in manifest), 9)
+
+    def test_018_type_registry(self):
+        class ListSink:
+            def __init__(self):
+                self.triples = []
+
+            def add(self, triple):
+                self.triples.append(triple)
+
+        def convert(sink, type_registry=None):
+            builders = {
+                tag: [
+                    partial(make_appellations, type_domain="https://foo/types", type_registry=type_registry),
+                    partial(make_e42_identifiers, type_domain="https://foo/types", type_registry=type_registry),
+                ]
+                for tag in ["person", "place", "org"]
+            }
+            return convert_stream(BytesIO(sample.encode("utf-8")), builders, "https://foo/bar/", sink=sink)
+
+        plain = convert(ListSink())
+        registry = TypeRegistry()
+        deduped = convert(ListSink(), registry)
+        self.assertTrue(len(deduped.triples) < len(plain.triples))
+        self.assertEqual(len(deduped.triples), len(set(deduped.triples)))
+        self.assertEqual(set(plain.triples), set(deduped.triples))
+        self.assertTrue(URIRef("https://foo/types/date/approx") in registry)
+        self.assertEqual(
+            len(registry),
+            len({s for s, p, o in plain.triples if o == CIDOC["E55_Type"]})
+        )
+        vocabulary = Graph()
+        registry = TypeRegistry(vocabulary=vocabulary)
+        data = convert(Graph(), registry)
+        self.assertEqual(len(list(data.triples((None, RDF.type, CIDOC["E55_Type"])))), 0)
+        self.assertEqual(set(vocabulary), set(registry.to_graph()))
+        self.assertEqual(set(data) | set(vocabulary), set(plain.triples))
+
+    def test_019_date_literal_cache(self):
+        date_literal_cache_clear()
+        first = date_to_literal("1900-01-01")
+        self.assertTrue(first is date_to_literal("1900-01-01", "undefined", "en"))
+        self.assertFalse(first is date_to_literal("1900-01-01", default_lang="de"))
+        info = date_literal_cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 2))
+        date_literal_cache_clear()
+        create_e52(URIRef("https://foo/bar/ts"), begin_of_begin="1900", end_of_end="1901")
+        info = date_literal_cache_info()
+        self.assertEqual(info.hits + info.misses, 2)
+        smart_string = ET.fromstring('<date when="1902"/>').xpath("@when")[0]
+        self.assertTrue(smart_string.getparent() is not None)
+        with mock.patch("acdh_cidoc_pyutils._date_to_literal", wraps=_date_to_literal) as cached:
+            date_to_literal(smart_string)
+        self.assertTrue(type(cached.call_args[0][0]) is str)
+
+    def test_020_term_pool(self):
+        self.assertEqual(E55_Type, CIDOC["E55_Type"])
+        self.assertEqual(P2_has_type, CIDOC["P2_has_type"])
+        pool = TermPool(maxsize=2)
+        self.assertTrue(pool.uri("https://foo/bar") is pool.uri("https://foo/bar"))
+        self.assertTrue(pool.literal("hansi", lang="de") is pool.literal("hansi", lang="de"))
+        self.assertFalse(pool.literal("hansi", lang="de") is pool.literal("hansi"))
+        self.assertEqual(len(pool), 2)
+        doc = ET.fromstring(sample)
+        pool = TermPool()
+        set_term_pool(pool)
+        try:
+            g = Graph()
+            for x in doc.xpath(".//tei:place|.//tei:org", namespaces=NSMAP):
+                xml_id = x.attrib["{http://www.w3.org/XML/1998/namespace}id"]
+                subj = URIRef(f"https://foo/bar/{xml_id}")
+                make_appellations(subj, x, type_domain="https://foo/types", sink=g)
+                make_e42_identifiers(subj, x, type_domain="https://foo/types", sink=g)
+        finally:
+            set_term_pool(None)
+        self.assertTrue(pool.hits > 0)
+        type_uris = [o for s, p, o in g.triples((None, P2_has_type, None))]
+        approx = pool.uri("https://foo/types/date/approx")
+        self.assertTrue(approx in g.subjects(RDF.type, E55_Type))
+        for uri in type_uris:
+            self.assertTrue(uri is pool.uri(f"{uri}"))
+
+    def test_021_minting(self):
+        domain = "https://hansi4ever.com/"
+        uri = make_uri(domain=domain, version="1", prefix="sumsi", key="DWpers0091")
+        self.assertEqual(uri, make_uri(domain=domain, version="1", prefix="sumsi", key="DWpers0091"))
+        self.assertTrue(f"{uri}".startswith("https://hansi4ever.com/1/sumsi/"))
+        self.assertNotEqual(uri, make_uri(domain=domain, version="1", prefix="sumsa", key="DWpers0091"))
+        self.assertNotEqual(
+            make_uri(domain=domain, key=("a", "b")), make_uri(domain=domain, key=("ab",))
+        )
+        uris = make_uris(1000, domain=domain, prefix="sumsi")
+        self.assertEqual(len(set(uris)), 1000)
+        self.assertTrue(f"{uris[0]}".startswith("https://hansi4ever.com/sumsi/"))
+        minter = UriMinter(domain=domain, prefix="sumsi")
+        self.assertEqual(minter.mint("x"), make_uri(domain=domain, prefix="sumsi", key="x"))
+        self.assertEqual(minter.mint_many(keys=["x", "y"])[0], minter.mint("x"))
+        with self.assertRaises(ValueError):
+            minter.mint()
+        minter = UriMinter(domain=domain, strategy="counter", run_prefix="run1-")
+        self.assertEqual(minter.mint(), URIRef("https://hansi4ever.com/run1-0"))
+        self.assertEqual(minter.mint_many(2)[-1], URIRef("https://hansi4ever.com/run1-2"))
+        self.assertEqual(minter.mint(), URIRef("https://hansi4ever.com/run1-3"))
+        uris = UriMinter(domain=domain, strategy="uuid1").mint_many(3)
+        self.assertEqual(len(set(uris)), 3)
+        self.assertEqual({uuid.UUID(f"{x}".split("/")[-1]).version for x in uris}, {1})
+        minter = UriMinter(domain=domain, strategy="uuid1")
+        self.assertEqual(len(set(minter.mint_many(10))), 10)
+        with self.assertRaises(ValueError):
+            UriMinter(strategy="hansi")
+
+    def test_022_incremental(self):
+        builders = {
+            "place": [partial(make_appellations, type_domain="https://foo/types"), coordinates_to_p168],
+            "org": [partial(make_e42_identifiers, type_domain="https://foo/types")],
+        }
+        expected = convert_stream(BytesIO(sample.encode("utf-8")), builders, "https://foo/bar/")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_path = os.path.join(tmp_dir, "cache.sqlite")
+            with EntityCache(cache_path, params={"run": 1}) as cache:
+                g = convert_incremental(BytesIO(sample.encode("utf-8")), builders, "https://foo/bar/", cache)
+                self.assertEqual((cache.hits, cache.misses), (0, 5))
+            self.assertEqual(set(g), set(expected))
+            with EntityCache(cache_path, params={"run": 1}) as cache:
+                g = convert_incremental(BytesIO(sample.encode("utf-8")), builders, "https://foo/bar/", cache)
+                self.assertEqual((cache.hits, cache.misses), (5, 0))
+                stream = BytesIO()
+                with NTriplesWriter(stream) as writer:
+                    convert_incremental(BytesIO(sample.encode("utf-8")), builders, "https://foo/bar/", cache, writer)
+                parsed = Graph().parse(data=stream.getvalue().decode("utf-8"), format="nt")
+                self.assertEqual(set(parsed), set(expected))
+            self.assertEqual(set(g), set(expected))
+            changed = re.sub(
+                '<org xml:id="DWorg00002">.*?</org>', "", sample.replace(">Reval<", ">Revel<"), flags=re.S
+            )
+            with EntityCache(cache_path, params={"run": 1}) as cache:
+                g = convert_incremental(BytesIO(changed.encode("utf-8")), builders, "https://foo/bar/", cache)
+                self.assertEqual((cache.hits, cache.misses), (3, 1))
+                self.assertEqual(len(cache), 4)
+            self.assertTrue("Revel" in g.serialize(format="nt"))
+            with EntityCache(cache_path, params={"run": 2}) as cache:
+                convert_incremental(BytesIO(changed.encode("utf-8")), builders, "https://foo/bar/", cache)
+                self.assertEqual(cache.hits, 0)
+            with EntityCache(cache_path, params={"run": 2}) as cache:
+                mapping = compile_mapping({
+                    "domain": "https://foo/bar/",
+                    "entities": {
+                        "person": [{"builder": "appellations"}, {"builder": "affiliations"}],
+                        "place": [{"builder": "coordinates"}],
+                    },
+                })
+                mapping.builders["person"][0].builders[1].keywords["org_index"] = LabelIndex({"DWorg00001": "x"})
+                for hits in (0, 7):
+                    g = convert_incremental(
+                        BytesIO(sample.encode("utf-8")), mapping.builders, "https://foo/bar/", cache
+                    )
+                    self.assertEqual(cache.hits, hits)
+                self.assertEqual(set(g), set(mapping.convert(BytesIO(sample.encode("utf-8")))))
+                builders = {"place": [partial(make_appellations, type_registry=TypeRegistry())]}
+                with self.assertRaises(ValueError):
+                    convert_incremental(BytesIO(sample.encode("utf-8")), builders, "https://foo/bar/", cache)
+
+    def test_023_benchmarks(self):
+        data = generate_corpus(n_persons=20, n_places=10, n_orgs=5, seed=1)
+        self.assertEqual(data, generate_corpus(n_persons=20, n_places=10, n_orgs=5, seed=1))
+        self.assertNotEqual(data, generate_corpus(n_persons=20, n_places=10, n_orgs=5, seed=2))
+        doc = ET.fromstring(data.encode("utf-8"))
+        for tag, count in [("person", 20), ("place", 10), ("org", 5)]:
+            self.assertEqual(len(doc.xpath(f".//tei:{tag}", namespaces=NSMAP)), count)
+        for element in ["persName/tei:forename", "occupation", "affiliation", "event", "birth", "death", "geo"]:
+            self.assertTrue(doc.xpath(f".//tei:{element}", namespaces=NSMAP))
+        results = run_benchmark(n_persons=20, n_places=10, n_orgs=5, repeat=1)
+        self.assertEqual(results["end_to_end"]["entities"], 35)
+        self.assertTrue(results["builders"]["make_appellations"]["triples"] > 0)
+        ratios = compare_benchmarks(results, results)
+        self.assertEqual(ratios["end_to_end"], 1.0)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            baseline = os.path.join(tmp_dir, "baseline.json")
+            output = os.path.join(tmp_dir, "output.json")
+            with open(baseline, "w") as f:
+                json.dump(results, f)
+            argv = ["--persons", "5", "--places", "5", "--orgs", "5", "--repeat", "1"]
+            benchmark_main(argv + ["--baseline", baseline, "--output", output, "--threshold", "0"])
+            with open(output) as f:
+                self.assertTrue("end_to_end" in json.load(f)["comparison"])
+
+    def test_024_stats(self):
+        doc = ET.fromstring(sample)
+        x = doc.xpath(".//tei:person[1]", namespaces=NSMAP)[0]
+        subj = URIRef("https://foo/bar/DWpers0091")
+        self.assertTrue(get_active_stats() is None)
+        with Stats() as stats:
+            self.assertTrue(get_active_stats() is stats)
+            g = make_appellations(subj, x)
+            self.assertTrue(isinstance(g, Graph))
+            g, uris = make_occupations(subj, x)
+            self.assertTrue(isinstance(g, Graph))
+            make_occupations(subj, x, sink=g)
+            shared = Graph()
+            make_birth_death_entities(subj, x, domain="https://foo/bar/", sink=shared)
+        self.assertTrue(get_active_stats() is None)
+        make_appellations(subj, x)
+        data = stats.to_dict()
+        self.assertEqual(data["make_appellations"]["calls"], 1)
+        self.assertEqual(data["make_occupations"]["calls"], 2)
+        self.assertTrue(data["make_occupations"]["triples"] >= 2 * len(g))
+        self.assertTrue(data["make_appellations"]["xpath_evaluations"] > 0)
+        self.assertEqual(data["make_birth_death_entities"]["triples"], len(shared))
+        self.assertTrue(data["create_e52"]["cache_hits"] + data["create_e52"]["cache_misses"] > 0)
+        self.assertEqual(json.loads(stats.dump_json()), data)
+
+    def test_025_compact_buffer(self):
+        doc = ET.fromstring(sample)
+        x = doc.xpath(".//tei:person[1]", namespaces=NSMAP)[0]
+        subj = URIRef("https://foo/bar/DWpers0091")
+        g = Graph()
+        dictionary = TermDictionary()
+        buffer = CompactTripleBuffer(dictionary)
+        for sink in (g, buffer):
+            make_appellations(subj, x, sink=sink)
+            make_occupations(subj, x, sink=sink)
+            make_appellations(subj, x, sink=sink)
+        self.assertTrue(len(buffer) > len(g))
+        self.assertEqual(set(buffer), set(g))
+        before = len(buffer)
+        self.assertEqual(buffer.deduplicate(), before - len(g))
+        self.assertEqual(len(buffer), len(g))
+        self.assertEqual(set(buffer.to_graph()), set(g))
+        self.assertTrue(len(dictionary) < 3 * len(buffer))
+        self.assertEqual(dictionary.term(dictionary.id(subj)), subj)
+        self.assertTrue((subj, RDF.type, CIDOC["E21_Person"]) not in buffer)
+        self.assertTrue(next(iter(g)) in buffer)
+        unique = CompactTripleBuffer(dictionary, dedup=True)
+        for triple in list(g) + list(g):
+            unique.add(triple)
+        self.assertEqual(len(unique), len(g))
+        self.assertEqual(set(unique.id_triples()), set(buffer.id_triples()))
+        self.assertTrue(all(type(x) is int for x in unique._keys))
+        late = (subj, RDF.type, CIDOC["E21_Person"])
+        buffer.add(late)
+        self.assertTrue(late in buffer)
+        self.assertEqual(unpack_ids(pack_ids(1, 2 ** 32 - 1, 3)), (1, 2 ** 32 - 1, 3))
+
+    def test_026_make_entity(self):
+        doc = ET.fromstring(sample)
+        x = doc.xpath(".//tei:person[1]", namespaces=NSMAP)[0]
+        subj = URIRef("https://foo/bar/DWpers0091")
+        index = index_entity(x)
+        self.assertEqual(index["persName"], x.xpath(".//tei:persName", namespaces=NSMAP))
+        self.assertEqual(index["idno"], x.xpath(".//tei:idno", namespaces=NSMAP))
+        self.assertEqual(index["death"], x.xpath(".//tei:death", namespaces=NSMAP))
+        builders = [
+            partial(make_appellations, type_domain="https://foo/bar/types"),
+            partial(make_e42_identifiers, type_domain="https://foo/bar/types"),
+            make_occupations,
+            partial(make_affiliations, domain="https://foo/bar/", person_label="Schnitzler"),
+            partial(make_birth_death_entities, domain="https://foo/bar/"),
+            partial(make_birth_death_entities, domain="https://foo/bar/", event_type="death"),
+            partial(make_events, type_domain="https://foo/bar/types"),
+        ]
+        g = Graph()
+        for builder in builders:
+            builder(subj, x, sink=g)
+        entity_graph = make_entity(subj, x, builders)
+        self.assertEqual(set(entity_graph), set(g))
+        sink = Graph()
+        self.assertTrue(make_entity(subj, x, builders, sink=sink, entity_index=index) is sink)
+        self.assertEqual(set(sink), set(g))
+        place = doc.xpath(".//tei:place[1]", namespaces=NSMAP)[0]
+        place_subj = URIRef("https://foo/bar/DWplace00092")
+        g = make_entity(place_subj, place, [coordinates_to_p168, make_e42_identifiers])
+        expected = coordinates_to_p168(place_subj, place)
+        make_e42_identifiers(place_subj, place, sink=expected)
+        self.assertEqual(set(g), set(expected))
+
+    def test_027_aio(self):
+        builders = {
+            "place": [partial(make_appellations, type_domain="https://foo/types"), coordinates_to_p168],
+            "person": [partial(make_occupations, prefix="job")],
+        }
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            sources = []
+            expected = Graph()
+            for i in range(6):
+                data = sample.replace('xml:id="', f'xml:id="f{i}_')
+                source = os.path.join(tmp_dir, f"sample{i}.xml")
+                with open(source, "w") as f:
+                    f.write(data)
+                sources.append(source)
+                convert_stream(BytesIO(data.encode("utf-8")), builders, "https://foo/bar/", sink=expected)
+            for ordered in (False, True):
+                g = convert_files(sources, builders, "https://foo/bar/", concurrency=2, ordered=ordered)
+                self.assertEqual(set(g), set(expected))
+
+            async def collect():
+                return [x async for x in aiter_files(sources, concurrency=3, queue_size=1, ordered=True)]
+
+            result = asyncio.run(collect())
+            self.assertEqual([x[0] for x in result], sources)
+            self.assertEqual([len(x[1]) for x in result], [10] * 6)
+            with self.assertRaises(FileNotFoundError):
+                convert_files(sources + [os.path.join(tmp_dir, "missing.xml")], builders, "https://foo/bar/")
+
+    def test_028_sort_unique(self):
+        builders = {
+            "place": [partial(make_appellations, type_domain="https://foo/types")],
+            "person": [partial(make_e42_identifiers, type_domain="https://foo/types")],
+        }
+        expected = convert_stream(BytesIO(sample.encode("utf-8")), builders, "https://foo/bar/")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            run_dir = os.path.join(tmp_dir, "runs")
+            os.mkdir(run_dir)
+            shards = []
+            for i, compression in enumerate([None, "gzip", "lzma"]):
+                shard = os.path.join(tmp_dir, f"shard{i}.nt{['', '.gz', '.xz'][i]}")
+                with NTriplesWriter(shard, compression=compression) as writer:
+                    convert_stream(BytesIO(sample.encode("utf-8")), builders, "https://foo/bar/", sink=writer)
+                shards.append(shard)
+            for memory_limit, max_merge in [(None, 64), (2000, 64), (2000, 2)]:
+                out = os.path.join(tmp_dir, "out.nt")
+                kwargs = {"memory_limit": memory_limit} if memory_limit else {}
+                count = sort_unique(shards, out, tmp_dir=run_dir, max_merge=max_merge, **kwargs)
+                with open(out, "rb") as f:
+                    lines = f.read().splitlines()
+                self.assertEqual(lines, sorted(set(lines)))
+                self.assertEqual(count, len(expected))
+                self.assertEqual(os.listdir(run_dir), [])
+                g = Graph().parse(out, format="nt")
+                self.assertEqual(set(g), set(expected))
+
+    def test_029_sqlite_sink(self):
+        builders = {
+            "place": [partial(make_appellations, type_domain="https://foo/types"), coordinates_to_p168],
+            "person": [make_occupations, partial(make_e42_identifiers, type_domain="https://foo/types")],
+        }
+        expected = convert_stream(BytesIO(sample.encode("utf-8")), builders, "https://foo/bar/")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "out.sqlite")
+            with SQLiteSink(path, batch_size=7) as store:
+                convert_stream(BytesIO(sample.encode("utf-8")), builders, "https://foo/bar/", sink=store)
+                self.assertEqual(len(store), len(expected))
+            with SQLiteSink(path) as store:
+                self.assertEqual(set(store), set(expected))
+                convert_stream(BytesIO(sample.encode("utf-8")), builders, "https://foo/bar/", sink=store)
+                self.assertEqual(len(store), len(expected))
+                subj = URIRef("https://foo/bar/DWpers0091")
+                self.assertTrue(store.has_subject(subj))
+                self.assertFalse(store.has_subject(URIRef("https://foo/bar/nope")))
+                self.assertEqual(
+                    set(store.triples((subj, None, None))), set(expected.triples((subj, None, None)))
+                )
+                self.assertEqual(
+                    set(store.triples((None, RDF.type, E55_Type))), set(expected.triples((None, RDF.type, E55_Type)))
+                )
+                triple = next(iter(expected))
+                self.assertTrue(triple in store)
+                out = os.path.join(tmp_dir, "out.nt.gz")
+                self.assertEqual(store.export_ntriples(out), len(expected))
+                self.assertEqual(set(store.to_graph()), set(expected))
+            with gzip.open(out) as f:
+                g = Graph().parse(data=f.read().decode("utf-8"), format="nt")
+            self.assertEqual(set(g), set(expected))
+            small = os.path.join(tmp_dir, "small.sqlite")
+            with SQLiteSink(small, batch_size=7, cache_size=2) as store:
+                for _ in range(2):
+                    convert_stream(BytesIO(sample.encode("utf-8")), builders, "https://foo/bar/", sink=store)
+                self.assertEqual(set(store), set(expected))
+                self.assertTrue(store._key_id.cache_info().currsize <= 2)
+                terms = {x for triple in expected for x in triple}
+                self.assertEqual(store.conn.execute("SELECT COUNT(*) FROM terms").fetchone()[0], len(terms))
+
+    def test_030_import_time(self):
+        code = (
+            "import sys, acdh_cidoc_pyutils; "
+            "print(' '.join(x for x in sys.modules if x.split('.')[0] in ('slugify', 'acdh_tei_pyutils')))"
+        )
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True
+        )
+        self.assertEqual(result.stdout.strip(), "")
+        cumulative = None
+        for line in result.stderr.splitlines():
+            parts = [x.strip() for x in line.split("|")]
+            if len(parts) == 3 and parts[2] == "acdh_cidoc_pyutils":
+                cumulative = int(parts[1]) / 1000
+        self.assertTrue(cumulative is not None)
+        self.assertTrue(
+            cumulative < IMPORT_TIME_BUDGET_MS,
+            f"import acdh_cidoc_pyutils took {cumulative} ms (budget {IMPORT_TIME_BUDGET_MS} ms)",
+        )
+        self.assertEqual(slugify("Foo Bar"), "foo-bar")
+
+    def test_031_cli(self):
+        self.assertEqual(parse_size("512M"), 512 * 1024 * 1024)
+        self.assertEqual(parse_size("1.5k"), 1536)
+        self.assertEqual(parse_size("1000"), 1000)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for i in range(2):
+                with open(os.path.join(tmp_dir, f"sample{i}.xml"), "w") as f:
+                    f.write(sample.replace('xml:id="', f'xml:id="f{i}_'))
+            pattern = os.path.join(tmp_dir, "*.xml")
+            common = ["--domain", "https://foo/bar/", "--builders", "person=occupations,identifiers"]
+            out = os.path.join(tmp_dir, "out.nt")
+            self.assertEqual(cli_main(["convert", pattern, "-o", out] + common), 0)
+            expected = Graph().parse(out, format="nt")
+            self.assertTrue(URIRef("https://foo/bar/types/idno/xml-id") in set(expected.subjects()))
+            self.assertTrue(URIRef("https://foo/bar/f1_DWplace00092") in set(expected.subjects()))
+            unique = os.path.join(tmp_dir, "unique.nt.gz")
+            self.assertEqual(
+                cli_main(["convert", pattern, "-o", unique, "-w", "2", "--unique", "--memory-limit", "4K"] + common), 0
+            )
+            with gzip.open(unique) as f:
+                lines = f.read().splitlines()
+            self.assertEqual(lines, sorted(set(lines)))
+            self.assertEqual(set(Graph().parse(data=b"\n".join(lines).decode("utf-8"), format="nt")), set(expected))
+            store = os.path.join(tmp_dir, "out.sqlite")
+            self.assertEqual(cli_main(["convert", pattern, "-o", store, "-w", "2"] + common), 0)
+            with SQLiteSink(store) as sink:
+                self.assertEqual(set(sink), set(expected))
+            for name, rdf_format in (("workers.nt", "nt"), ("workers.ttl", "turtle")):
+                path = os.path.join(tmp_dir, name)
+                self.assertEqual(cli_main(["convert", pattern, "-o", path, "-w", "2"] + common), 0)
+                self.assertEqual(set(Graph().parse(path, format=rdf_format)), set(expected))
+            only_places = os.path.join(tmp_dir, "places.nq")
+            cli_main(["convert", pattern, "-o", only_places, "--builders", "person=", "--builders", "org=",
+                      "--graph", "https://foo/graph"] + common[:2])
+            quads = ConjunctiveGraph()
+            quads.parse(only_places, format="nquads")
+            self.assertEqual(
+                {x.identifier for x in quads.contexts()}, {URIRef("https://foo/graph")}
+            )
+            self.assertFalse(any("DWpers" in x for x in quads.subjects()))
+            defaults = os.path.join(tmp_dir, "defaults.nt")
+            self.assertEqual(cli_main(["convert", pattern, "-o", defaults] + common[:2]), 0)
+            g = Graph().parse(defaults, format="nt")
+            self.assertTrue((URIRef("https://foo/bar/f0_DWpers0091/death"), RDF.type, CIDOC["E69_Death"]) in g)
+            self.assertTrue((URIRef("https://foo/bar/f0_DWpers0091/birth"), RDF.type, CIDOC["E67_Birth"]) in g)
+            for person in ("f0_onlypersnameelement", "f0_maxicosi"):
+                for event in ("birth", "death"):
+                    self.assertFalse((URIRef(f"https://foo/bar/{person}/{event}"), None, None) in g)
+            deep_dir = os.path.join(tmp_dir, "deep")
+            os.makedirs(deep_dir)
+            with open(os.path.join(deep_dir, "deep.xml"), "w") as f:
+                f.write(sample.replace("<idno subtype=", "<note>" * 300 + "</note>" * 300 + "<idno subtype="))
+            deep_out = os.path.join(tmp_dir, "deep.nt")
+            self.assertEqual(
+                cli_main(["convert", os.path.join(deep_dir, "deep.xml"), "-o", deep_out, "-w", "2",
+                          "--entities-per-shard", "2", "--huge-tree"] + common), 0
+            )
+            self.assertTrue(len(Graph().parse(deep_out, format="nt")) > 0)
+            events = os.path.join(tmp_dir, "events.xml")
+            with open(events, "w") as f:
+                f.write("""<TEI xmlns="http://www.tei-c.org/ns/1.0">
+    <person xml:id="p1"><persName>Hansi</persName>
+        <event type="x"><note>no date</note></event>
+        <event><desc><date when="1900"/></desc><note>no type</note></event>
+        <event type="y"><desc><date when="1901"/></desc><note>complete</note></event>
+    </person>
+    <person xml:id="p2"><persName>Sumsi</persName><event type="x"><note>no date</note></event></person>
+</TEI>""")
+            events_out = os.path.join(tmp_dir, "events.nt")
+            self.assertEqual(cli_main(["convert", events, "-o", events_out] + common[:2]), 0)
+            g = Graph().parse(events_out, format="nt")
+            self.assertEqual(
+                set(g.subjects(RDF.type, CIDOC["E5_Event"])), {URIRef("https://foo/bar/p1/event/0")}
+            )
+            self.assertTrue((None, RDFS.label, Literal("Event: complete", lang="de")) in g)
+            with self.assertRaises(SystemExit):
+                cli_main(["convert", os.path.join(tmp_dir, "missing*.xml"), "-o", out] + common)
+
+    def test_032_mapping(self):
+        config = {
+            "domain": "https://foo/bar/",
+            "type_domain": "https://foo/bar/types",
+            "entities": {
+                "place": [{"builder": "appellations"}, {"builder": "coordinates", "inverse": True}],
+                "person": [
+                    {"builder": "occupations", "prefix": "job"},
+                    {"builder": "identifiers", "default_prefix": "ID: "},
+                    {"builder": "birth", "place_id_xpath": "//tei:placeName[1]/@key"},
+                ],
+            },
+        }
+        builders = {
+            "place": [
+                partial(make_appellations, type_domain="https://foo/bar/types", default_lang="de"),
+                partial(coordinates_to_p168, inverse=True),
+            ],
+            "person": [
+                partial(make_occupations, prefix="job", default_lang="de"),
+                partial(make_e42_identifiers, type_domain="https://foo/bar/types", default_prefix="ID: "),
+            ],
+        }
+        expected = convert_stream(BytesIO(sample.encode("utf-8")), builders, "https://foo/bar/")
+        for x in ET.fromstring(sample).xpath(".//tei:person[tei:persName][.//tei:birth]", namespaces=NSMAP):
+            subj = URIRef(f"https://foo/bar/{x.get('{http://www.w3.org/XML/1998/namespace}id')}")
+            make_birth_death_entities(
+                subj, x, "https://foo/bar/", place_id_xpath="//tei:placeName[1]/@key", sink=expected
+            )
+        mapping = compile_mapping(config)
+        self.assertEqual(set(mapping.builders), {"place", "person"})
+        self.assertEqual(set(mapping.convert(BytesIO(sample.encode("utf-8")))), set(expected))
+        mapping = pickle.loads(pickle.dumps(mapping))
+        self.assertEqual(set(mapping.convert(BytesIO(sample.encode("utf-8")))), set(expected))
+        toml = """domain = "https://foo/bar/"
+subject = {template = "{domain}entity/{id}", lower = true}
+
+[[entities.org]]
+builder = "appellations"
+"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            json_path = os.path.join(tmp_dir, "mapping.json")
+            with open(json_path, "w") as f:
+                json.dump(config, f)
+            g = compile_mapping(json_path).convert(BytesIO(sample.encode("utf-8")))
+            self.assertEqual(set(g), set(expected))
+            toml_path = os.path.join(tmp_dir, "mapping.toml")
+            with open(toml_path, "w") as f:
+                f.write(toml)
+            g = compile_mapping(toml_path).convert(BytesIO(sample.encode("utf-8")))
+            self.assertTrue(URIRef("https://foo/bar/entity/dworg00001") in set(g.subjects()))
+            source = os.path.join(tmp_dir, "sample.xml")
+            with open(source, "w") as f:
+                f.write(sample)
+            out = os.path.join(tmp_dir, "out.nt")
+            self.assertEqual(cli_main(["convert", source, "-o", out, "--mapping", json_path]), 0)
+            self.assertEqual(set(Graph().parse(out, format="nt")), set(expected))
+        for broken in [
+            {"entities": {}},
+            {"domain": "https://foo/bar/", "entities": {"person": [{"builder": "nope"}]}},
+            {"domain": "https://foo/bar/", "entities": {"person": [{"builder": "occupations", "foo": 1}]}},
+            {"domain": "https://foo/bar/", "entities": {"person": [{"builder": "occupations", "id_xpath": "@@"}]}},
+            {"domain": "https://foo/bar/", "entities": {"person": [{"prefix": "job"}]}},
+        ]:
+            with self.assertRaises(ValueError):
+                compile_mapping(broken)
+
+    def test_033_appellation_type_cache(self):
+        doc = ET.fromstring(sample)
+        appellation_type_cache_clear()
+        self.assertEqual(appellation_type_cache_info().currsize, 0)
+        uri, label = appellation_type("https://foo/types/person/persName", "Alt Label")
+        self.assertEqual(uri, URIRef("https://foo/types/person/persname/alt-label"))
+        self.assertEqual(label, Literal("Alt Label"))
+        self.assertTrue(appellation_type("https://foo/types/person/persName", "Alt Label")[0] is uri)
+        self.assertEqual(
+            appellation_type("https://foo/types/person/persName"), (URIRef("https://foo/types/person/persname"), None)
+        )
+        self.assertEqual(appellation_type_cache_info().hits, 1)
+        appellation_type_cache_clear()
+        g = Graph()
+        nodes = doc.xpath(".//tei:person|.//tei:place|.//tei:org", namespaces=NSMAP)
+        for x in nodes + nodes:
+            subj = URIRef(f"https://foo/bar/{x.get('{http://www.w3.org/XML/1998/namespace}id')}")
+            make_appellations(subj, x, type_domain="https://foo/types", sink=g)
+        info = appellation_type_cache_info()
+        self.assertEqual(info.misses, len(set(g.subjects(RDF.type, E55_Type))))
+        self.assertTrue(info.hits >= info.misses)
+        with Stats() as stats:
+            make_appellations(subj, nodes[0], type_domain="https://foo/types")
+        self.assertTrue(stats.to_dict()["make_appellations"]["cache_hits"] > 0)
+
+    def test_034_bulk_coordinates(self):
+        geos = ["48.2066 16.37341", "123 456", "148.2066 16.37341", "abc 12", "12", "", None, "12 500", "-33.9 nan"]
+        places = "".join(
+            f'<place xml:id="p{i}"><location><geo>{x}</geo></location></place>' if x is not None
+            else f'<place xml:id="p{i}"/>'
+            for i, x in enumerate(geos)
+        )
+        doc = ET.fromstring(f'<TEI xmlns="http://www.tei-c.org/ns/1.0">{places}</TEI>')
+        items = [
+            (URIRef(f"https://foo/bar/{x.get('{http://www.w3.org/XML/1998/namespace}id')}"), x)
+            for x in doc.xpath(".//tei:place", namespaces=NSMAP)
+        ]
+        for inverse in (False, True):
+            expected = Graph()
+            for subj, x in items:
+                coordinates_to_p168(subj, x, inverse=inverse, sink=expected)
+            g, coordinates = coordinates_to_p168_bulk(items, inverse=inverse, validate=False)
+            self.assertEqual(set(g), set(expected))
+        g, coordinates = coordinates_to_p168_bulk(items)
+        self.assertEqual(len(coordinates), len(geos))
+        self.assertEqual(
+            [x[1] for x in coordinates.malformed()],
+            ["out of range", "swapped", "not numeric", "format", "missing", "missing", "out of range", "not numeric"],
+        )
+        self.assertEqual(coordinates.counts()["missing"], 2)
+        self.assertEqual(coordinates.status[0], STATUS_OK)
+        self.assertEqual(coordinates.status[2], STATUS_SWAPPED)
+        self.assertAlmostEqual(coordinates.lat[0], 48.2066)
+        p168 = CIDOC["P168_place_is_defined_by"]
+        wkt = URIRef("geo:wktLiteral")
+        self.assertEqual(set(g), {(items[0][0], p168, Literal("Point(16.37341 48.2066)", datatype=wkt))})
+        g, _ = coordinates_to_p168_bulk(items, fix_swapped=True)
+        self.assertTrue((items[2][0], p168, Literal("Point(148.2066 16.37341)", datatype=wkt)) in g)
+        sink = Graph()
+        self.assertTrue(coordinates_to_p168_bulk(items, coords_xpath=".//tei:location/tei:geo", sink=sink)[0] is sink)
+        self.assertEqual(len(sink), 1)
+
+    def test_035_org_index(self):
+        orgs = ET.fromstring(sample)
+        index = build_org_index(orgs)
+        self.assertEqual(index.get("DWorg00001"), "Stahlhelm")
+        self.assertEqual(index.get("#DWorg00002"), "GDVP")
+        self.assertEqual(index.get("nope", "fallback"), "fallback")
+        self.assertTrue("#DWorg00001" in index)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "listorg.xml")
+            with open(path, "w") as f:
+                f.write(sample)
+            self.assertEqual(build_org_index(path).labels, index.labels)
+        full_names = build_org_index(orgs, name_xpath="./tei:orgName[@type='full']")
+        self.assertEqual(full_names.get("DWorg00002"), "Großdeutsche Volkspartei")
+        person = ET.fromstring("""
+<TEI xmlns="http://www.tei-c.org/ns/1.0">
+    <person xml:id="DWpers0091">
+        <persName type="pref">Gulbransson, Olaf</persName>
+        <affiliation notBefore="1900" notAfter="1931" ref="#DWorg00001">the helmets</affiliation>
+        <affiliation notBefore="1931" ref="#DWorg00009">SAPD</affiliation>
+    </person>
+</TEI>""").xpath(".//tei:person", namespaces=NSMAP)[0]
+        subj = URIRef("https://foo/bar/DWpers0091")
+        labels = set()
+        for org_index in (None, index):
+            g = make_affiliations(subj, person, "https://foo/bar/", "Gulbransson, Olaf", org_index=org_index)
+            labels.add(frozenset(f"{x}" for x in g.objects(None, RDFS.label)))
+        without_index, with_index = sorted(labels, key=lambda x: "Gulbransson, Olaf joins Stahlhelm" in x)
+        self.assertTrue("Gulbransson, Olaf joins the helmets" in without_index)
+        self.assertTrue("Gulbransson, Olaf joins Stahlhelm" in with_index)
+        self.assertTrue("Gulbransson, Olaf leaves Stahlhelm" in with_index)
+        self.assertTrue("Gulbransson, Olaf joins SAPD" in with_index)
+        self.assertEqual((index.hits, index.misses), (3, 2))
+        self.assertEqual(len(LabelIndex({"a": "A"})), 1)
+
+    def test_036_reference_index(self):
+        doc = ET.fromstring("""
+<TEI xmlns="http://www.tei-c.org/ns/1.0">
+    <listPerson>
+        <person xml:id="DWpers0091">
+            <persName type="pref">Gulbransson, Olaf</persName>
+            <birth when="1873-05-26"><placeName key="#DWplace00139">Christiania (Oslo)</placeName></birth>
+            <affiliation notBefore="1900" ref="#DWorg00001">Stahlhelm</affiliation>
+            <affiliation notBefore="1931" ref="#DWorg00009">SAPD</affiliation>
+        </person>
+    </listPerson>
+    <listOrg><org xml:id="DWorg00001"><orgName>Stahlhelm</orgName></org></listOrg>
+</TEI>""")
+        index = build_reference_index(doc)
+        self.assertEqual(index.ids, {"DWpers0091", "DWorg00001"})
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "sample.xml")
+            with open(path, "wb") as f:
+                f.write(ET.tostring(doc))
+            self.assertEqual(build_reference_index(path).ids, index.ids)
+        person = doc.xpath(".//tei:person", namespaces=NSMAP)[0]
+        subj = URIRef("https://foo/bar/DWpers0091")
+        make_affiliations(subj, person, "https://foo/bar/", "Gulbransson, Olaf", ref_index=index)
+        make_birth_death_entities(subj, person, "https://foo/bar/", ref_index=index)
+        self.assertEqual(index.checked, 3)
+        self.assertEqual([x["ref"] for x in index.report()], ["DWorg00009", "DWplace00139"])
+        self.assertEqual(index.report()[0], {"ref": "DWorg00009", "count": 1, "referrers": [str(subj)]})
+        index = ReferenceIndex({"DWorg00001", "DWorg00009", "DWplace00139"})
+        mapping = compile_mapping(
+            {"domain": "https://foo/bar/", "entities": {"person": [{"builder": "affiliations"}, {"builder": "birth"}]}},
+            ref_index=index,
+        )
+        mapping.convert(BytesIO(ET.tostring(doc)))
+        self.assertEqual((index.checked, index.report()), (3, []))
+
+    def test_037_turtle_writer(self):
+        builders = {
+            "place": [coordinates_to_p168, make_e42_identifiers],
+            "person": [partial(make_appellations, default_lang="en")],
+        }
+        g = convert_stream(BytesIO(sample.encode("utf-8")), builders, "https://foo/bar/")
+        stream = BytesIO()
+        with TurtleWriter(stream) as writer:
+            convert_stream(BytesIO(sample.encode("utf-8")), builders, "https://foo/bar/", sink=writer)
+            self.assertEqual(writer._subjects, {})
+        data = stream.getvalue().decode("utf-8")
+        self.assertTrue(data.startswith("@prefix cidoc: <http://www.cidoc-crm.org/cidoc-crm/> .\n"))
+        self.assertTrue(" a cidoc:E42_Identifier ;\n" in data)
+        self.assertEqual(set(Graph().parse(data=data, format="turtle")), set(g))
+        tricky = URIRef("https://foo/bar/tricky")
+        triples = [
+            (tricky, RDFS.label, Literal('line "one"\nline \\two', lang="de-AT")),
+            (tricky, RDFS.label, Literal("ümlaut")),
+            (tricky, RDFS.seeAlso, URIRef("https://foo/bar/with space")),
+            (tricky, RDFS.seeAlso, URIRef("https://foo/bar/with space")),
+            (tricky, RDF.type, CIDOC["E53_Place"]),
+            (tricky, CIDOC["P3_has_note"], Literal("1", datatype=URIRef("http://www.w3.org/2001/XMLSchema#integer"))),
+        ]
+        stream = BytesIO()
+        with TurtleWriter(stream, prefixes={"": "https://foo/bar/", "crm": CIDOC}, buffer_size=5) as writer:
+            writer += triples
+        data = stream.getvalue().decode("utf-8")
+        self.assertEqual(writer.count, 6)
+        self.assertTrue(data.startswith("@prefix : <https://foo/bar/> .\n@prefix crm: "))
+        self.assertTrue(":tricky a crm:E53_Place ;\n" in data)
+        self.assertTrue("<https://foo/bar/with\\u0020space>" in data)
+        self.assertTrue('"1"^^<http://www.w3.org/2001/XMLSchema#integer>' in data)
+        self.assertEqual(set(Graph().parse(data=data, format="turtle")), set(triples))
+
+    def test_038_nested_entities(self):
+        data = """
+<TEI xmlns="http://www.tei-c.org/ns/1.0">
+    <place xml:id="at">
+        <placeName>Österreich</placeName>
+        <place xml:id="vie">
+            <placeName>Wien</placeName>
+            <location><geo>48.2066 16.37341</geo></location>
+        </place>
+    </place>
+    <org xml:id="oeaw">
+        <orgName>ÖAW</orgName>
+        <org xml:id="acdh"><orgName>ACDH</orgName></org>
+    </org>
+</TEI>
+""".encode("utf-8")
+        ids = [x.get("{http://www.w3.org/XML/1998/namespace}id") for x in iter_entities(BytesIO(data))]
+        self.assertEqual(ids, ["vie", "at", "acdh", "oeaw"])
+        builders = {
+            "place": [partial(make_appellations, type_domain="https://foo/types"), coordinates_to_p168],
+            "org": [partial(make_appellations, type_domain="https://foo/types")],
+        }
+        g = convert_stream(BytesIO(data), builders, "https://foo/bar/")
+        expected = Graph()
+        doc = ET.fromstring(data)
+        for x in doc.xpath(".//tei:place|.//tei:org", namespaces=NSMAP):
+            subj = URIRef(f"https://foo/bar/{x.attrib['{http://www.w3.org/XML/1998/namespace}id']}")
+            for builder in builders[x.tag.split("}")[-1]]:
+                builder(subj, x, sink=expected)
+        self.assertEqual(set(g), set(expected))
+        self.assertEqual(len(set(g.subjects(CIDOC["P1_is_identified_by"], None))), 4)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            source = os.path.join(tmp_dir, "nested.xml")
+            with open(source, "wb") as f:
+                f.write(data)
+            self.assertEqual(set(convert_files([source], builders, "https://foo/bar/")), set(expected))
+            self.assertEqual(len(build_org_index(source)), 2)